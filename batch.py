@@ -0,0 +1,192 @@
+"""
+Renders charts from a csv without a browser session. Each chart is written as a standalone html page and/or the json
+of its bokeh document.
+
+    python batch.py data.csv specs.json --out charts
+
+The spec file holds a list of charts, each with an "x" column and optionally "y", "group", "plot_type" (Line, Bar,
+Scatter, Histogram or Density), "palette", "bins", "title" and "name", which is used for the output file names.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from bokeh.document import Document
+from bokeh.embed import file_html
+from bokeh.resources import CDN
+
+import charts
+import ingest
+import storage
+
+
+# bytes read at a time when hashing the csv
+HASH_BLOCK = 1024 * 1024
+
+
+def file_digest(path):
+    """
+    :param path: file path
+    :return: hash of the file's contents, the same one uploads of the file are stored under
+    """
+
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as f:
+
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def load_specs(path):
+    """
+    :param path: json file holding a list of chart specs
+    :return: list of names and ChartSpecs without their dataset
+    """
+
+    with open(path) as f:
+
+        specs = json.load(f)
+
+    named = []
+
+    for i, spec in enumerate(specs):
+
+        if "x" not in spec:
+
+            raise ValueError("Chart {} has no x column".format(i))
+
+        named.append((spec.get("name") or "chart-{}".format(i), charts.spec_from_dict(None, spec)))
+
+    return named
+
+
+def prepare(csv_path, specs, chunksize=100000):
+    """
+    Adds the csv to the dataset store and parses every column the charts use in one pass over the file
+
+    :param csv_path: csv file
+    :param specs: chart specs
+    :param chunksize: rows parsed per chunk
+    :return: StoredDataset
+    """
+
+    key = file_digest(csv_path)
+
+    with open(csv_path, "rb") as f:
+
+        stored = storage.load(key) or storage.create(key, f)
+
+    # charts asking for columns that aren't in the file fail on their own when they are built
+    used = OrderedDict.fromkeys(c for spec in specs for c in (spec.x, spec.y, spec.group) if c in stored.kinds)
+    needed = [c for c in used if not stored.has(c)]
+
+    if needed:
+
+        csv = ingest.ChunkedCSV(open(stored.source, "rb"), chunksize=chunksize, encoding=storage.ENCODING,
+                                **ingest.read_options(stored.kinds, needed))
+
+        while csv.read_chunk() is not None:
+
+            pass
+
+        stored.add(csv.store.to_frame())
+
+    return stored
+
+
+def render(dataset_path, name, spec, out_dir, formats):
+    """
+    Builds one chart and writes its outputs, run in the worker processes. The dataset is memory mapped so the workers
+    share its pages rather than each holding a copy.
+
+    :param dataset_path: folder of the stored dataset
+    :param name: name of the output files
+    :param spec: ChartSpec
+    :param out_dir: folder to write to
+    :param formats: "html" and/or "json"
+    :return: name of the chart and None, or the error if it couldn't be built
+    """
+
+    try:
+        gp, app_layout = charts.build_plot(storage.StoredDataset(dataset_path), spec, static=True)
+
+        path = os.path.join(out_dir, name)
+
+        # the controls only work in a bokeh server session, standalone output is just the figure with the spec's
+        # title, palette and bins
+        doc = Document()
+        doc.add_root(gp.p)
+
+        if "html" in formats:
+
+            with open(path + ".html", "w") as f:
+
+                f.write(file_html(doc, CDN, spec.title or name))
+
+        if "json" in formats:
+
+            with open(path + ".json", "w") as f:
+
+                f.write(doc.to_json_string())
+
+    except Exception as e:
+
+        return name, "{}: {}".format(type(e).__name__, e)
+
+    return name, None
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Render charts from a csv without a browser session")
+    parser.add_argument("csv", help="csv file to plot")
+    parser.add_argument("specs", help="json file with a list of chart specs")
+    parser.add_argument("--out", default="charts", help="folder to write the charts to")
+    parser.add_argument("--format", nargs="+", choices=["html", "json"], default=["html"], dest="formats",
+                        help="outputs to write for every chart")
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--store", default=storage.STORE_DIR, help="folder of the dataset store")
+
+    args = parser.parse_args(argv)
+
+    storage.STORE_DIR = args.store
+    os.makedirs(args.out, exist_ok=True)
+
+    named = load_specs(args.specs)
+    stored = prepare(args.csv, [spec for name, spec in named])
+
+    failed = 0
+
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+
+        futures = [pool.submit(render, stored.path, name, spec._replace(dataset=stored.key), args.out, args.formats)
+                   for name, spec in named]
+
+        for future in futures:
+
+            name, error = future.result()
+
+            if error is None:
+
+                print("Wrote {}".format(name))
+
+            else:
+
+                failed += 1
+                print("Couldn't build {}: {}".format(name, error), file=sys.stderr)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
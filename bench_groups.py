@@ -0,0 +1,48 @@
+"""
+Times splitting rows by group and building the grouped sources of a plot as the number of groups grows.
+
+    python bench_groups.py --rows 1000000 --groups 10 100 1000 10000 100000
+
+split_groups is the one factorize and sort pass, GraphPlot.__init__ adds the palette and one ColumnDataSource per
+group on top of it.
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+
+import graphs
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Time splitting grouped data as the number of groups grows")
+    parser.add_argument("--rows", type=int, default=1000000, help="number of rows")
+    parser.add_argument("--groups", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000],
+                        help="numbers of groups to time")
+    parser.add_argument("--repeat", type=int, default=3, help="runs timed for each number of groups")
+
+    args = parser.parse_args(argv)
+
+    rng = np.random.RandomState(0)
+    x = pd.Series(rng.rand(args.rows))
+    y = pd.Series(rng.rand(args.rows))
+
+    print("{} rows, best of {} runs".format(args.rows, args.repeat))
+    print("{:>8} {:>16} {:>22}".format("groups", "split_groups ms", "GraphPlot.__init__ ms"))
+
+    for n in args.groups:
+
+        group = pd.Series(rng.randint(0, n, args.rows)).astype(str)
+
+        split = min(timeit.repeat(lambda: graphs.split_groups(group, x=x, y=y), number=1, repeat=args.repeat))
+        init = min(timeit.repeat(lambda: graphs.GraphPlot(x, y, group=group), number=1, repeat=args.repeat))
+
+        print("{:>8} {:>16.1f} {:>22.1f}".format(n, split * 1000, init * 1000))
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,78 @@
+"""
+Times moving the bins slider of a histogram, from the new bin count to the bars being in their sources.
+
+    python bench_histogram.py --rows 10000000 --groups 1
+
+The first plot builds the sorted index of every group, each bin count after that only searches it. With --before the
+pd.cut pipeline that parsed the interval labels back into floats is timed on the same data, which takes minutes at
+10M rows.
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+
+import graphs
+
+
+# bin counts the slider is moved through
+BINS = (7, 20, 50, 99, 3)
+
+
+def cut_labels(x, bins):
+    """
+    Bins values the way change_bins did before the histogram index
+
+    :param x: values
+    :param bins: number of bins
+    :return: dataframe of left edges, right edges and counts
+    """
+
+    cuts = pd.Series(pd.cut(x, bins)).astype(str).str.replace(r"\(|\]", "", regex=True).str.split(", ", expand=True)
+
+    return cuts.astype(float).groupby([0, 1], as_index=False).size()
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Time the histogram bins slider")
+    parser.add_argument("--rows", type=int, default=10000000, help="number of rows")
+    parser.add_argument("--groups", type=int, default=1, help="number of groups")
+    parser.add_argument("--before", action="store_true", help="also time the old pd.cut pipeline")
+
+    args = parser.parse_args(argv)
+
+    rng = np.random.RandomState(0)
+    x = pd.Series(rng.normal(0, 1, args.rows))
+    group = pd.Series(rng.randint(0, args.groups, args.rows)) if args.groups > 1 else None
+
+    gp = graphs.GraphPlot(x, None, group=group)
+
+    start = timeit.default_timer()
+    gp.plot_histogram(BINS[0])
+    print("{} rows, {} groups".format(args.rows, args.groups))
+    print("  first plot: {:8.1f} ms".format((timeit.default_timer() - start) * 1000))
+
+    for bins in BINS[1:]:
+
+        seconds = min(timeit.repeat(lambda: gp.change_bins("value_throttled", None, bins), number=1, repeat=3))
+        print("  {:>3} bins:  {:8.1f} ms".format(bins, seconds * 1000))
+
+    if args.before:
+
+        for bins in BINS[1:]:
+
+            start = timeit.default_timer()
+
+            for k, s in gp.sources():
+
+                cut_labels(s.data["x"], bins)
+
+            print("  {:>3} bins before: {:8.1f} ms".format(bins, (timeit.default_timer() - start) * 1000))
+
+
+if __name__ == "__main__":
+
+    main()
@@ -0,0 +1,84 @@
+"""
+Times building a scatter plot, from GraphPlot(...) to its layout, with the palettes built the way they used to be and
+with the process wide palette registry.
+
+    python bench_palettes.py --rows 1000 --groups 5
+
+"before" builds every palette matplotlib knows about for each plot, as GraphPlot.palette_maps did. "cold" empties the
+registry before each plot so only the selected palette is built. "warm" reuses the registry, which is what every
+Submit after the first one in a process sees.
+"""
+
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+import seaborn
+from matplotlib import pyplot
+
+import graphs
+import palettes
+
+
+def every_palette(name, n_colors):
+    """
+    Builds the palettes the way GraphPlot did before the registry
+
+    :param name: palette name
+    :param n_colors: number of colors to assign
+    :return: list of hex codes
+    """
+
+    palette_map = {n: seaborn.color_palette(n, n_colors).as_hex() for n in pyplot.colormaps() if n != "jet"}
+
+    return palette_map[name]
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Time building a scatter plot before and after the palette registry")
+    parser.add_argument("--rows", type=int, default=1000, help="number of rows")
+    parser.add_argument("--groups", type=int, default=5, help="number of groups")
+    parser.add_argument("--repeat", type=int, default=5, help="number of plots timed for each case")
+
+    args = parser.parse_args(argv)
+
+    rng = np.random.RandomState(0)
+    x = pd.Series(rng.rand(args.rows))
+    y = pd.Series(rng.rand(args.rows))
+    group = pd.Series(rng.randint(0, args.groups, args.rows)).astype(str)
+
+    def plot():
+
+        graphs.GraphPlot(x, y, group=group).plot_scatter()
+
+    def cold():
+
+        palettes.registry.clear()
+        plot()
+
+    current = graphs.get_palette
+
+    try:
+        graphs.get_palette = every_palette
+        before = timeit.repeat(plot, number=1, repeat=args.repeat)
+
+    finally:
+        graphs.get_palette = current
+
+    after_cold = timeit.repeat(cold, number=1, repeat=args.repeat)
+
+    plot()
+    after_warm = timeit.repeat(plot, number=1, repeat=args.repeat)
+
+    print("{} rows, {} groups, median of {} plots".format(args.rows, args.groups, args.repeat))
+
+    for name, times in (("before", before), ("cold", after_cold), ("warm", after_warm)):
+
+        print("{:>8}: {:8.1f} ms".format(name, np.median(times) * 1000))
+
+
+if __name__ == "__main__":
+
+    main()
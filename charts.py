@@ -0,0 +1,155 @@
+from collections import OrderedDict, namedtuple
+
+import graphs
+
+
+# everything a chart is built from, so equal specs always give the same chart
+ChartSpec = namedtuple("ChartSpec", ["dataset", "x", "y", "group", "plot_type", "palette", "bins", "title"])
+ChartSpec.__new__.__defaults__ = (None, None, "Scatter", "Accent", 7, None)
+
+
+def spec_from_dict(dataset, values):
+    """
+    :param dataset: content hash of the dataset
+    :param values: dict of spec fields, like a chart of a batch spec file
+    :return: ChartSpec
+    """
+
+    return ChartSpec(dataset, **{f: values[f] for f in ChartSpec._fields[1:] if values.get(f) is not None})
+
+
+def build(stored, spec, factorize=None):
+    """
+    Builds the layout of a chart
+
+    :param stored: StoredDataset with the spec's columns parsed
+    :param spec: ChartSpec
+    :param factorize: function giving the group codes of a column if they are cached somewhere
+    :return: layout
+    """
+
+    return build_plot(stored, spec, factorize=factorize)[1]
+
+
+def build_plot(stored, spec, factorize=None, static=False):
+    """
+    Builds a chart
+
+    :param stored: StoredDataset with the spec's columns parsed
+    :param spec: ChartSpec
+    :param factorize: function giving the group codes of a column if they are cached somewhere
+    :param static: whether the chart is for standalone output, where only its figure gp.p is used
+    :return: GraphPlot and its layout
+    """
+
+    x, y, group = spec.x, spec.y, spec.group
+
+    missing = [c for c in (x, y, group) if c is not None and c not in stored.kinds]
+
+    if missing:
+
+        raise ValueError("Columns not in the file: {}".format(", ".join(missing)))
+
+    # ranges and bin edges come from the summaries saved with the columns
+    kwargs = dict(x_axis_type="datetime" if stored.kinds.get(x) == "datetime" else "linear",
+                  palette=spec.palette, plot_title=spec.title or " ", static=static,
+                  column_stats={role: stored.stats(c) for role, c in (("x", x), ("y", y), ("group", group))
+                                if c is not None})
+
+    if group is not None:
+
+        kwargs["group"] = stored[group]
+
+        if factorize is not None:
+
+            kwargs["group_codes"] = factorize(group)
+
+    gp = graphs.GraphPlot(x=stored[x], y=stored[y] if y is not None else None, **kwargs)
+
+    if spec.plot_type == "Scatter":
+
+        app_layout = gp.plot_scatter()
+
+    elif spec.plot_type == "Line":
+
+        app_layout = gp.plot_line()
+
+    elif spec.plot_type == "Bar":
+
+        app_layout = gp.plot_bar()
+
+    elif spec.plot_type == "Histogram":
+
+        app_layout = gp.plot_histogram(spec.bins)
+
+    elif spec.plot_type == "Density":
+
+        app_layout = gp.plot_density()
+
+    else:
+
+        raise ValueError("Unknown plot type {}".format(spec.plot_type))
+
+    if spec.title:
+
+        gp.change_figure_title(None, None, spec.title)
+
+    return gp, app_layout
+
+
+class RenderCache:
+    """
+    Layouts already built in a session keyed by their spec, so submitting the same chart again or going back to one
+    shows it without building it again. Bokeh models belong to one document, so every session has its own cache. A
+    cached chart keeps its full resolution data for redrawing, so the cache is limited by the bytes its charts hold as
+    well as by their number.
+    """
+
+    def __init__(self, max_size=8, budget=256 * 1024 ** 2):
+        """
+        :param max_size: number of layouts kept, the least recently shown are dropped first
+        :param budget: bytes the cached charts may hold, the chart shown last is kept even if it is over on its own
+        """
+
+        self.max_size = max_size
+        self.budget = budget
+        self.layouts = OrderedDict()
+
+    def get(self, spec):
+        """
+        :param spec: ChartSpec
+        :return: layout or None
+        """
+
+        entry = self.layouts.get(spec)
+
+        if entry is None:
+
+            return None
+
+        self.layouts.move_to_end(spec)
+
+        return entry[0]
+
+    def put(self, spec, app_layout, plot=None):
+        """
+        :param spec: ChartSpec
+        :param app_layout: layout
+        :param plot: GraphPlot the layout was built from, whose data counts towards the budget
+        :return: None
+        """
+
+        self.layouts[spec] = (app_layout, plot)
+        self.layouts.move_to_end(spec)
+
+        while len(self.layouts) > 1 and (len(self.layouts) > self.max_size or self.nbytes() > self.budget):
+
+            self.layouts.popitem(last=False)
+
+    def nbytes(self):
+
+        return sum(plot.nbytes() for app_layout, plot in self.layouts.values() if plot is not None)
+
+    def clear(self):
+
+        self.layouts.clear()
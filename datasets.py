@@ -0,0 +1,147 @@
+from collections import OrderedDict
+from threading import Lock
+
+import pandas as pd
+
+from storage import StoredDataset
+
+
+def frame_nbytes(frame):
+    """
+    :param frame: dataframe or stored dataset
+    :return: bytes of process memory the frame holds
+    """
+
+    if isinstance(frame, StoredDataset):
+
+        # memory mapped pages belong to the page cache and are shared with other processes
+        return 0
+
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+class Dataset:
+    """
+    Parsed upload shared by every session that loads the same file, along with anything worked out from it. The frame
+    is shared between sessions so it must not be changed in place.
+    """
+
+    def __init__(self, key, frame):
+        """
+        :param key: content hash of the uploaded file
+        :param frame: parsed dataframe
+        """
+
+        self.key = key
+        self.frame = frame
+        self.artifacts = {}
+        self.lock = Lock()
+        self.nbytes = frame_nbytes(frame)
+
+    def artifact(self, name, build):
+        """
+        Gets something worked out from the frame, building it the first time it is asked for
+
+        :param name: hashable name of the artifact
+        :param build: function taking the frame and returning the artifact
+        :return: artifact
+        """
+
+        with self.lock:
+
+            if name in self.artifacts:
+
+                return self.artifacts[name]
+
+        value = build(self.frame)
+
+        with self.lock:
+
+            self.artifacts.setdefault(name, value)
+            self.nbytes += sum(getattr(v, "nbytes", 0) for v in (value if isinstance(value, tuple) else (value,)))
+
+            return self.artifacts[name]
+
+    def factorize(self, column):
+        """
+        Group codes of a column, groups are numbered in sorted order and missing values get -1
+
+        :param column: column name
+        :return: codes and group values
+        """
+
+        return self.artifact(("factorize", column), lambda frame: pd.factorize(frame[column], sort=True))
+
+
+class DatasetCache:
+    """
+    Process wide cache of parsed uploads keyed by the hash of the file's contents. The least recently used datasets
+    are dropped once the cache goes over its memory budget.
+    """
+
+    def __init__(self, budget=2 * 1024 ** 3):
+        """
+        :param budget: bytes the cached datasets may use
+        """
+
+        self.budget = budget
+        self.datasets = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        """
+        :param key: content hash
+        :return: cached dataset or None
+        """
+
+        with self.lock:
+
+            dataset = self.datasets.get(key)
+
+            if dataset is not None:
+
+                self.datasets.move_to_end(key)
+
+            return dataset
+
+    def put(self, key, frame):
+        """
+        Caches a parsed frame, if another session got there first its dataset is used instead
+
+        :param key: content hash
+        :param frame: parsed dataframe
+        :return: dataset
+        """
+
+        with self.lock:
+
+            if key not in self.datasets:
+
+                self.datasets[key] = Dataset(key, frame)
+
+            self.datasets.move_to_end(key)
+            dataset = self.datasets[key]
+
+            self.evict(keep=key)
+
+            return dataset
+
+    def evict(self, keep=None):
+
+        # the newest dataset is kept even if it is over budget on its own
+        while self.nbytes() > self.budget and len(self.datasets) > 1:
+
+            oldest = next(iter(self.datasets))
+
+            if oldest == keep:
+
+                break
+
+            self.datasets.popitem(last=False)
+
+    def nbytes(self):
+
+        return sum(d.nbytes for d in self.datasets.values())
+
+
+cache = DatasetCache()
@@ -0,0 +1,429 @@
+import numpy as np
+
+
+def as_float(values):
+    """
+    Turns numeric or datetime values into floats, datetimes become milliseconds since epoch like bokeh uses
+
+    :param values: array like
+    :return: float array or None if the values can't be placed on a continuous axis
+    """
+
+    values = np.asarray(values)
+
+    if np.issubdtype(values.dtype, np.datetime64):
+
+        floats = values.astype("datetime64[ms]").astype("float64")
+        floats[np.isnat(values)] = np.nan
+
+        return floats
+
+    if np.issubdtype(values.dtype, np.number) or values.dtype == np.bool_:
+
+        return values.astype("float64", copy=False)
+
+    return None
+
+
+def _buckets(values, start, end, n):
+
+    span = end - start
+
+    if not span:
+
+        span = 1.0
+
+    return np.clip(((values - start) / span * n).astype(np.int64), 0, n - 1)
+
+
+def minmax_lines(x, y, start, end, buckets):
+    """
+    Decimates a line to the points that are needed to draw it at a given width. For every bucket of x the first, last,
+    minimum and maximum points are kept so spikes and the shape of the line survive.
+
+    :param x: x values as floats
+    :param y: y values as floats
+    :param start: start of the visible x range
+    :param end: end of the visible x range
+    :param buckets: number of buckets, usually the plot width in pixels
+    :return: sorted indices of the points to draw
+    """
+
+    visible = np.flatnonzero((x >= start) & (x <= end))
+
+    if len(visible):
+
+        # keep a point either side of the range so lines run off the edge of the plot
+        edges = [i for i in (visible[0] - 1, visible[-1] + 1) if 0 <= i < len(x)]
+
+    else:
+
+        edges = []
+
+    if len(visible) <= 4 * buckets:
+
+        return np.union1d(visible, edges).astype(np.int64)
+
+    b = _buckets(x[visible], start, end, buckets)
+
+    # first and last point of each bucket in data order
+    first = np.unique(b, return_index=True)[1]
+    last = len(b) - 1 - np.unique(b[::-1], return_index=True)[1]
+
+    # minimum and maximum of each bucket
+    order = np.lexsort((y[visible], b))
+    sorted_b = b[order]
+    starts = np.flatnonzero(np.r_[True, sorted_b[1:] != sorted_b[:-1]])
+    ends = np.r_[starts[1:] - 1, len(sorted_b) - 1]
+
+    keep = np.concatenate([first, last, order[starts], order[ends]])
+
+    return np.union1d(visible[keep], edges).astype(np.int64)
+
+
+def grid_sample(x, y, x_start, x_end, y_start, y_end, nx, ny):
+    """
+    Samples a scatter plot by laying a grid over the visible area and keeping one point per occupied cell. Dense areas
+    get thinned out while sparse points and outliers are all kept.
+
+    :param x: x values as floats
+    :param y: y values as floats
+    :param x_start: start of the visible x range
+    :param x_end: end of the visible x range
+    :param y_start: start of the visible y range
+    :param y_end: end of the visible y range
+    :param nx: number of cells across
+    :param ny: number of cells down
+    :return: sorted indices of the points to draw
+    """
+
+    visible = np.flatnonzero((x >= x_start) & (x <= x_end) & (y >= y_start) & (y <= y_end))
+
+    if len(visible) <= nx * ny // 4:
+
+        return visible
+
+    cells = _buckets(y[visible], y_start, y_end, ny) * nx + _buckets(x[visible], x_start, x_end, nx)
+
+    return np.sort(visible[np.unique(cells, return_index=True)[1]])
+
+
+def density_grid(x, y, x_start, x_end, y_start, y_end, nx, ny):
+    """
+    Counts the points that fall in each cell of a grid laid over the visible area, so a plot of any number of points
+    can be drawn as one image of the grid
+
+    :param x: x values as floats
+    :param y: y values as floats
+    :param x_start: start of the visible x range
+    :param x_end: end of the visible x range
+    :param y_start: start of the visible y range
+    :param y_end: end of the visible y range
+    :param nx: number of cells across
+    :param ny: number of cells down
+    :return: (ny, nx) array of counts, the first row is the bottom of the plot like bokeh images
+    """
+
+    visible = (x >= x_start) & (x <= x_end) & (y >= y_start) & (y <= y_end)
+
+    cells = _buckets(y[visible], y_start, y_end, ny) * nx + _buckets(x[visible], x_start, x_end, nx)
+
+    return np.bincount(cells, minlength=nx * ny).reshape(ny, nx)
+
+
+class ColumnBuffer:
+    """
+    Column that rows can be appended to and dropped from the front of without copying the rows it keeps. Like a list
+    it grows its space a quarter at a time, so streaming rows in costs a copy of the kept rows only every so often.
+    drop and append never write over arrays handed out by values, replace can.
+    """
+
+    def __init__(self, values):
+        """
+        :param values: starting values, they are only read
+        """
+
+        self.data = np.asarray(values)
+        self.start = 0
+        self.end = len(self.data)
+
+    @property
+    def values(self):
+
+        return self.data[self.start:self.end]
+
+    def __len__(self):
+
+        return self.end - self.start
+
+    def drop(self, n):
+        """
+        :param n: number of rows to drop from the front
+        :return: None
+        """
+
+        self.start = min(self.start + n, self.end)
+
+    def append(self, values):
+        """
+        :param values: rows to add to the end
+        :return: None
+        """
+
+        values = np.asarray(values)
+        dtype = np.result_type(self.data.dtype, values.dtype)
+
+        if self.end + len(values) > len(self.data) or dtype != self.data.dtype:
+
+            kept = len(self)
+            data = np.empty((kept + len(values)) * 5 // 4 + 1024, dtype=dtype)
+            data[:kept] = self.values
+
+            self.data = data
+            self.start = 0
+            self.end = kept
+
+        self.data[self.end:self.end + len(values)] = values
+        self.end += len(values)
+
+    def replace(self, start, end, values):
+        """
+        Replaces a run of rows, in place when the run is at either end
+
+        :param start: first row to replace
+        :param end: row after the last one to replace
+        :param values: rows to put in their place
+        :return: None
+        """
+
+        values = np.asarray(values)
+
+        if end == len(self):
+
+            self.end = self.start + start
+            self.append(values)
+
+        elif start == 0 and len(values) <= end and values.dtype == self.data.dtype:
+
+            self.drop(end - len(values))
+            self.data[self.start:self.start + len(values)] = values
+
+        else:
+
+            kept = self.values
+            self.__init__(np.concatenate([kept[:start], values, kept[end:]]))
+
+
+# bucket widths of the datetime resampling ladder in milliseconds, from a second up to a week
+RESAMPLE_LEVELS = (1e3, 5e3, 15e3, 6e4, 3e5, 9e5, 3.6e6, 2.16e7, 8.64e7, 6.048e8)
+
+
+class ResampleLadder:
+    """
+    Time series resampled to a ladder of fixed bucket widths, keeping the min, max and mean of every bucket. A level
+    is built the first time a zoom needs it and kept, so moving around the plot only slices levels that already
+    exist.
+    """
+
+    def __init__(self, x, y, levels=RESAMPLE_LEVELS):
+        """
+        :param x: times as milliseconds since epoch
+        :param y: y values as floats
+        :param levels: bucket widths in milliseconds, smallest first
+        """
+
+        keep = np.isfinite(x) & np.isfinite(y)
+        x = x[keep]
+        y = y[keep]
+
+        # rows that come in time order are kept in row order, so rows rolling off the front can be dropped in place
+        self.ordered = not (len(x) and (np.diff(x) < 0).any())
+
+        if not self.ordered:
+
+            order = np.argsort(x, kind="mergesort")
+            x = x[order]
+            y = y[order]
+
+        self.xs = ColumnBuffer(x)
+        self.ys = ColumnBuffer(y)
+        self.x = x
+        self.y = y
+        self.levels = levels
+        self.cache = {}
+
+    def pick(self, start, end, buckets):
+        """
+        :param start: start of the visible range
+        :param end: end of the visible range
+        :param buckets: number of buckets wanted across the range, usually the plot width in pixels
+        :return: widest bucket width that still gives a bucket per pixel, None if the raw points should be drawn
+        """
+
+        per_bucket = (end - start) / float(buckets)
+        fitting = [w for w in self.levels if w <= per_bucket]
+
+        return fitting[-1] if fitting else None
+
+    def level(self, width):
+        """
+        :param width: bucket width in milliseconds
+        :return: dict of bucket middles and the min, max and mean of each bucket, sorted by time. The arrays are
+                 updated in place as rows come and go.
+        """
+
+        if width not in self.cache:
+
+            self.cache[width] = {c: ColumnBuffer(v) for c, v in self.resample(self.x, self.y, width).items()}
+
+        return {c: b.values for c, b in self.cache[width].items()}
+
+    @staticmethod
+    def resample(x, y, width):
+        """
+        :param x: sorted times
+        :param y: y values
+        :param width: bucket width
+        :return: dict of bucket middles and the min, max and mean of each bucket
+        """
+
+        if not len(x):
+
+            empty = np.array([])
+
+            return dict(x=empty, lower=empty, upper=empty, mean=empty)
+
+        bucket = np.floor(x / width)
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        counts = np.diff(np.r_[starts, len(x)])
+
+        return dict(x=(bucket[starts] + .5) * width,
+                    lower=np.minimum.reduceat(y, starts),
+                    upper=np.maximum.reduceat(y, starts),
+                    mean=np.add.reduceat(y, starts) / counts)
+
+    def append(self, x, y):
+        """
+        Adds rows, only the buckets of the levels built so far that the rows fall in are worked out again
+
+        :param x: times as milliseconds since epoch
+        :param y: y values as floats
+        :return: None
+        """
+
+        keep = np.isfinite(x) & np.isfinite(y)
+        x = x[keep]
+        y = y[keep]
+
+        if not len(x):
+
+            return
+
+        if len(x) > 1 and (np.diff(x) < 0).any():
+
+            order = np.argsort(x, kind="mergesort")
+            x = x[order]
+            y = y[order]
+
+            self.ordered = False
+
+        if len(self.x) and x[0] < self.x[-1]:
+
+            # rows from the past are merged into place, which copies the kept rows
+            at = np.searchsorted(self.x, x, side="right")
+
+            self.xs = ColumnBuffer(np.insert(self.x, at, x))
+            self.ys = ColumnBuffer(np.insert(self.y, at, y))
+            self.ordered = False
+
+        else:
+
+            self.xs.append(x)
+            self.ys.append(y)
+
+        self.x = self.xs.values
+        self.y = self.ys.values
+
+        self.invalidate(x[0], x[-1])
+
+    def drop(self, n):
+        """
+        Drops the first rows, only for ladders whose rows have all come in time order
+
+        :param n: number of rows with a finite time and y value to drop
+        :return: None
+        """
+
+        if not n:
+
+            return
+
+        self.xs.drop(n)
+        self.ys.drop(n)
+
+        self.x = self.xs.values
+        self.y = self.ys.values
+
+        if not len(self.x):
+
+            self.cache.clear()
+
+            return
+
+        # buckets before the first row left are gone and the one it is in may have lost rows
+        self.invalidate(-np.inf, self.x[0])
+
+    def invalidate(self, start, end):
+        """
+        Works out the buckets of every level built so far that overlap a range of times again from the rows
+
+        :param start: start of the range
+        :param end: end of the range
+        :return: None
+        """
+
+        for width, level in self.cache.items():
+
+            first = np.floor(start / width)
+            last = np.floor(end / width)
+
+            # bucket middles are sorted and sit half a bucket away from the bucket edges
+            middles = level["x"].values
+            replaced = np.searchsorted(middles, first * width), np.searchsorted(middles, (last + 1) * width)
+
+            # a bucket either side of the range is searched in case the edges round the other way
+            lo = np.searchsorted(self.x, (first - 1) * width)
+            hi = np.searchsorted(self.x, (last + 2) * width)
+
+            rows = np.floor(self.x[lo:hi] / width)
+            inside = slice(lo + np.searchsorted(rows, first), lo + np.searchsorted(rows, last, side="right"))
+
+            middle = self.resample(self.x[inside], self.y[inside], width)
+
+            for c, buffer in level.items():
+
+                buffer.replace(replaced[0], replaced[1], middle[c])
+
+    def window(self, start, end, buckets):
+        """
+        Buckets of the level that suits the visible range, with one either side so lines run off the edge of the plot
+
+        :param start: start of the visible range
+        :param end: end of the visible range
+        :param buckets: number of buckets wanted across the range
+        :return: dict of x, lower, upper and mean or None if the raw points should be drawn
+        """
+
+        width = self.pick(start, end, buckets)
+
+        if width is None:
+
+            return None
+
+        level = self.level(width)
+
+        lo = max(np.searchsorted(level["x"], start) - 1, 0)
+        hi = np.searchsorted(level["x"], end, side="right") + 1
+
+        # copies, so the sources they are drawn from don't change when the level is updated
+        return {c: v[lo:hi].copy() for c, v in level.items()}
@@ -7,23 +7,51 @@ Created on Wed May 03 11:26:21 2017
 https://github.com/bokeh/bokeh/issues/6096
 """
 
-import pandas as pd
-from bokeh.models import ColumnDataSource, CustomJS, TableColumn
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from bokeh.models import ColumnDataSource, TableColumn
 from bokeh.layouts import row
 
-import io
-import base64
+import charts
+import datasets
+import ingest
+import storage
+import upload
+
+
+# plots are built here so a slow build doesn't hold up the server
+build_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+
 
-import graphs
+class BuildCancelled(Exception):
+    """
+    Raised in a build that has been replaced by a later submit
+    """
 
 
 class ImportData:
 
     def __init__(self):
 
-        self.file_source = ColumnDataSource({'file_contents': [], 'file_name': []})
-
         self.df = None
+        self.dataset = None
+        self.digest = None
+        self.chunk_size = 100000
+
+        # rows shown per page of the preview and rows taken when the whole file is sampled
+        self.page_size = 10
+        self.sample_size = 1000
+        self.page = 0
+        self.sample = None
+
+        # bumped by every submit, builds check it to find out they have been replaced
+        self.generation = 0
+
+        # charts already built in this session, submitting one of them again shows it straight away
+        self.renders = charts.RenderCache()
 
         self.layout = None
         self.doc = None
@@ -33,47 +61,23 @@ class ImportData:
         self.dt = None
         self.submit = None
 
+        self.prev_page = None
+        self.next_page = None
+        self.page_label = None
+        self.sample_button = None
+        self.summary = None
+
         self.g_label = None
         self.x_label = None
         self.y_label = None
 
         self.plot_type = None
         self.plot_label = None
+        self.status = None
 
-        self.cb = CustomJS(args=dict(file_source=self.file_source), code="""
-            function read_file(filename) {
-                var reader = new FileReader();
-                reader.onload = load_handler;
-                reader.onerror = error_handler;
-                // readAsDataURL represents the file's data as a base64 encoded string
-                reader.readAsDataURL(filename);
-            }
-
-            function load_handler(event) {
-                var b64string = event.target.result;
-                file_source.data = {'file_contents' : [b64string], 'file_name':[input.files[0].name]};
-                file_source.trigger("change");
-            }
-
-            function error_handler(evt) {
-                if(evt.target.error.name == "NotReadableError") {
-                    alert("Can't read file!");
-                }
-            }
-
-            var input = document.createElement('input');
-            input.setAttribute('type', 'file');
-            input.onchange = function(){
-                if (window.FileReader) {
-                    read_file(input.files[0]);
-                } else {
-                    alert('FileReader is not supported in this browser');
-                }
-            }
-            input.click();
-            """)
-
-        self.file_source.on_change('data', self.file_callback)
+        # the browser streams the file in binary chunks, file_callback gets the reassembled buffer
+        self.upload = upload.ChunkedUpload(self.file_callback)
+        self.cb = self.upload.cb
 
     def select_cols_x(self, attr, old, new):
 
@@ -105,19 +109,28 @@ class ImportData:
             self.g_drop.label = new
 
     def load_preview(self):
-        source = ColumnDataSource(data=dict())
-        columns = []
-
-        for col in self.df.columns:
-            source.data.update({col: self.df.head(10)[col].tolist()})
-            columns.append(TableColumn(field=col, title=col))
-
-        self.dt.source = source
-        self.dt.columns = columns
-        self.x_drop.menu = [("None", None)] + list(zip(self.df.columns.tolist(), self.df.columns.tolist()))
-        self.y_drop.menu = [("None", None)] + list(zip(self.df.columns.tolist(), self.df.columns.tolist()))
-        self.g_drop.menu = [("None", None)] + list(zip(self.df.columns.tolist(), self.df.columns.tolist()))
+        names = self.df.columns.tolist()
+
+        self.page = 0
+        self.sample = None
+
+        # rows are filled in a page at a time by show_page
+        self.dt.source = ColumnDataSource(data=dict())
+        self.dt.columns = [TableColumn(field=col, title=col) for col in names]
+
+        menu = [("None", None)] + list(zip(names, names))
+
+        self.x_drop.menu = menu
+        self.y_drop.menu = menu
+        self.g_drop.menu = menu
+        self.sample_button.label = "Sample whole file"
+        self.sample_button.disabled = False
+
+        self.show_page()
+
+        self.reset_document()
         self.doc.add_root(row([self.dt]))
+        self.doc.add_root(row([self.prev_page, self.page_label, self.next_page, self.sample_button]))
         self.doc.add_root(row([self.x_label, self.y_label, self.g_label]))
         self.doc.add_root(row([self.x_drop, self.y_drop, self.g_drop]))
         self.doc.add_root(row([self.plot_label]))
@@ -127,20 +140,155 @@ class ImportData:
         self.x_drop.on_change("value", self.select_cols_x)
         self.y_drop.on_change("value", self.select_cols_y)
         self.g_drop.on_change("value", self.select_cols_g)
+        self.prev_page.on_click(self.show_prev_page)
+        self.next_page.on_click(self.show_next_page)
+        self.sample_button.on_click(self.sample_callback)
         self.submit.on_click(self.submit_callback)
 
-    def file_callback(self, attr, old, new):
+    def show_page(self):
+        """
+        Fills the preview with the current page, read from the file or taken from the sample if there is one
+
+        :return: None
+        """
+
+        start = self.page * self.page_size
+
+        if self.sample is not None:
+
+            rows = self.sample.iloc[start:start + self.page_size]
+            total = len(self.sample.index)
+            name = "Sampled rows"
+
+        else:
+
+            rows = self.df.page(start, self.page_size)
+            total = self.df.rows
+            name = "Rows"
+
+        self.dt.source.data = {col: rows[col].tolist() for col in rows.columns}
+
+        end = start + len(rows.index)
+        of = "" if total is None else " of {}".format(total)
+
+        self.page_label.text = "{} {}-{}{}".format(name, start + 1, end, of)
+        self.prev_page.disabled = self.page == 0
+        self.next_page.disabled = len(rows.index) < self.page_size or end == total
+
+    def show_prev_page(self):
+
+        self.page = max(self.page - 1, 0)
+        self.show_page()
+
+    def show_next_page(self):
+
+        self.page += 1
+        self.show_page()
+
+    def sample_callback(self):
+
+        # the button switches back to the file once a sample is showing
+        if self.sample is not None:
+
+            self.sample = None
+            self.page = 0
+            self.sample_button.label = "Sample whole file"
+            self.show_page()
+
+            return
+
+        self.sample_button.disabled = True
+        self.status.text = "Sampling..."
+
+        future = build_pool.submit(ingest.scan, self.df.source, sample_size=self.sample_size,
+                                   chunksize=self.chunk_size, encoding=storage.ENCODING)
+        future.add_done_callback(partial(self.push_sample, self.df))
+
+    def push_sample(self, df, future):
+
+        self.doc.add_next_tick_callback(partial(self.show_sample, df, future))
+
+    def show_sample(self, df, future):
+        """
+        Shows a finished sample and the column summary that came with it
+
+        :param df: dataset the sample was taken from
+        :param future: future of the scan
+        :return: None
+        """
+
+        # another file has been uploaded since
+        if df is not self.df:
+
+            return
+
+        self.sample_button.disabled = False
+
+        error = future.exception()
+
+        if error is not None:
+
+            self.status.text = "Couldn't sample the file: {}".format(error)
+
+            return
+
+        self.sample, summary = future.result()
+        self.page = 0
+        self.sample_button.label = "Show file"
+        self.show_page()
+        self.report_progress()
+
+        self.summary.source = ColumnDataSource(data={col: summary[col].tolist() for col in summary.columns})
+        self.summary.columns = [TableColumn(field=col, title=col) for col in summary.columns]
+
+        if self.summary.document is None:
+
+            self.doc.add_root(row([self.summary]))
+
+    def file_callback(self, buffer, file_name, digest):
 
-        raw_contents = self.file_source.data['file_contents'][0]
-        # remove the prefix that JS adds
-        prefix, b64_contents = raw_contents.split(",", 1)
+        # builds and charts of the last file are no use any more
+        self.generation += 1
+        self.renders.clear()
+        self.digest = digest
 
-        file_contents = base64.b64decode(b64_contents)
-        file_io = io.StringIO(file_contents.decode("latin-1"))
+        # another session may already have opened the same file, or it may have been saved to disk before
+        self.dataset = datasets.cache.get(digest)
 
-        self.df = pd.read_csv(file_io)
+        if self.dataset is None:
 
+            # only the header and a sample are read now, columns are parsed once they are submitted
+            try:
+                stored = storage.load(digest) or storage.create(digest, buffer)
+
+            except OSError as e:
+
+                buffer.close()
+                self.status.text = "Couldn't save {}: {}".format(file_name, e)
+
+                return
+
+            self.dataset = datasets.cache.put(digest, stored)
+
+        buffer.close()
+
+        self.df = self.dataset.frame
         self.load_preview()
+        self.report_progress()
+
+    def report_progress(self):
+
+        if self.status is None:
+
+            return
+
+        if self.df.rows is None:
+
+            self.status.text = "Loaded {} columns".format(len(self.df.columns))
+
+        else:
+
+            self.status.text = "Loaded {} rows".format(self.df.rows)
 
     def submit_callback(self):
 
@@ -149,40 +297,130 @@ class ImportData:
         group = self.g_drop.value
 
         plot_type = self.plot_type.labels[self.plot_type.active]
+        spec = charts.ChartSpec(self.digest, x, y, group, plot_type)
 
-        if group is None and y is not None:
-            gp = graphs.GraphPlot(x=self.df[x], y=self.df[y])
-        elif group is not None and y is not None:
-            gp = graphs.GraphPlot(x=self.df[x], y=self.df[y], group=self.df[group])
-        elif group is not None and y is None:
-            gp = graphs.GraphPlot(x=self.df[x], y=None, group=self.df[group])
-        elif group is None and y is None:
-            gp = graphs.GraphPlot(x=self.df[x], y=None)
-        else:
+        # submitting again cancels the build that is running
+        self.generation += 1
 
-            pass
+        app_layout = self.renders.get(spec)
 
-        if plot_type == "Scatter":
+        if app_layout is not None:
 
-            app_layout = gp.plot_scatter()
+            self.show_chart(app_layout)
 
-        elif plot_type == "Line":
+            return
 
-            app_layout = gp.plot_line()
+        future = build_pool.submit(self.build, self.generation, spec)
+        future.add_done_callback(partial(self.push_build, self.generation, spec))
 
-        elif plot_type == "Bar":
+        self.status.text = "Building plot..."
 
-            app_layout = gp.plot_bar()
+    def build(self, generation, spec):
+        """
+        Parses the selected columns and builds the plot on the worker pool. Nothing here touches the document,
+        progress is pushed to it on the next tick.
 
-        elif plot_type == "Histogram":
+        :param generation: submit the build belongs to
+        :param spec: ChartSpec
+        :return: GraphPlot and its layout
+        """
 
-            app_layout = gp.plot_histogram(7)
+        x, y, group = spec.x, spec.y, spec.group
 
-        else:
+        # only the selected columns are parsed
+        needed = [c for c in OrderedDict.fromkeys([x, y, group]) if c in self.df.kinds and not self.df.has(c)]
+
+        if needed:
+
+            csv = ingest.ChunkedCSV(open(self.df.source, "rb"), chunksize=self.chunk_size, encoding=storage.ENCODING,
+                                    **ingest.read_options(self.df.kinds, needed))
+
+            try:
+                while csv.read_chunk() is not None:
+
+                    self.check_build(generation)
+                    self.push_status(generation, "Reading columns... {:.0%} ({} rows)".format(csv.progress(),
+                                                                                              csv.store.rows))
+
+            finally:
+
+                csv.close()
+
+            self.df.add(csv.store.to_frame())
+
+        self.check_build(generation)
+        self.push_status(generation, "Drawing plot...")
+
+        return charts.build_plot(self.df, spec, factorize=self.dataset.factorize)
+
+    def check_build(self, generation):
 
-            app_layout = None
+        if generation != self.generation:
+
+            raise BuildCancelled()
+
+    def push_status(self, generation, text):
+
+        self.doc.add_next_tick_callback(partial(self.show_status, generation, text))
+
+    def show_status(self, generation, text):
+
+        if generation == self.generation:
+
+            self.status.text = text
+
+    def push_build(self, generation, spec, future):
+
+        self.doc.add_next_tick_callback(partial(self.show_build, generation, spec, future))
+
+    def show_build(self, generation, spec, future):
+        """
+        Keeps a finished build and puts it in the document, unless another submit has come in since
+
+        :param generation: submit the build belongs to
+        :param spec: ChartSpec it was built from
+        :param future: future of the build
+        :return: None
+        """
+
+        if generation != self.generation:
+
+            return
+
+        error = future.exception()
+
+        if error is not None:
+
+            self.status.text = "Couldn't build the plot: {}".format(error)
+
+            return
+
+        plot, app_layout = future.result()
+
+        self.renders.put(spec, app_layout, plot)
+        self.show_chart(app_layout)
+
+    def reset_document(self):
+        """
+        Takes everything but the upload button and status off the page
+
+        :return: None
+        """
 
         self.doc.clear()
 
+        # progress, cancels and build errors are reported in the status, it has to stay in the document
+        if self.layout is not None:
+
+            self.doc.add_root(self.layout)
+
+    def show_chart(self, app_layout):
+
+        self.report_progress()
+
+        self.reset_document()
         self.doc.add_root(app_layout)
 
+        # the selection stays under the chart so other columns and plot types can be submitted
+        self.doc.add_root(row([self.x_drop, self.y_drop, self.g_drop]))
+        self.doc.add_root(row([self.plot_type, self.submit]))
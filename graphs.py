@@ -1,13 +1,172 @@
-import seaborn
+import os
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from bokeh.plotting import figure, curdoc
-from bokeh.models import Slider, ColumnDataSource, Select, TextInput, Legend, CheckboxGroup, Button
-from bokeh.models.renderers import GlyphRenderer
-from matplotlib import pyplot
+from bokeh.models import Slider, ColumnDataSource, Select, TextInput, Legend, CheckboxGroup, Button, Range1d, \
+    FactorRange, LogColorMapper
 from bokeh.layouts import layout, row, Spacer
-from math import floor, ceil
+from math import ceil
+import numpy as np
 import pandas as pd
-from stats import get_regression_line
+from stats import LinearFit, HistogramIndex
+from palettes import get_palette, palette_names
+import decimate
+from schedule import CoalescedCallback
+
+
+# default debounce intervals of the interactive controls in milliseconds. Sliders send value_throttled at most once
+# per interval while they are dragged, range changes are gathered on the server.
+DEBOUNCE = {"dot_size": 100, "alpha": 100, "line_width": 100, "bins": 100, "range": 150}
+
+# ways the rows at an x value can be turned into the height of its bar
+BAR_REDUCERS = ("sum", "mean", "count", "median")
+
+# regressions are fitted here so they don't hold up the server
+fit_pool = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+
+def fit_line(x, y):
+    """
+    Fits a regression line
+
+    :param x: x values
+    :param y: y values
+    :return: LinearFit
+    """
+
+    return LinearFit().add(decimate.as_float(x), decimate.as_float(y))
+
+
+def regression_band(fit, points=100):
+    """
+    Outline of a regression line and its prediction interval. Both are drawn through evenly spaced points across the
+    x values rather than at every row.
+
+    :param fit: LinearFit
+    :param points: number of points to draw the line through
+    :return: x and y of the line, x and y of the band outline
+    """
+
+    if not fit.n[0]:
+
+        return np.array([]), np.array([]), np.array([]), np.array([])
+
+    reg_x = np.linspace(fit.x_min[0], fit.x_max[0], points)
+    reg_y, pred_lower, pred_upper = fit.predict(reg_x)
+
+    band_x = np.concatenate([reg_x, reg_x[::-1]])
+    bounds = np.concatenate([pred_lower, pred_upper[::-1]])
+
+    return reg_x, reg_y, band_x, bounds
+
+
+def aggregate_bars(x, y, reducer="sum"):
+    """
+    Reduces rows to one bar per x value, so a bar chart only sends the browser as many bars as there are x values
+
+    :param x: x values
+    :param y: y values, or None to count the rows at each x value
+    :param reducer: one of BAR_REDUCERS, applied to the y values at each x value
+    :return: sorted x values and bar heights
+    """
+
+    codes, uniques = pd.factorize(np.asarray(x), sort=True)
+    keep = codes >= 0
+
+    if y is None:
+
+        top = np.bincount(codes[keep], minlength=len(uniques))
+
+    else:
+
+        top = pd.Series(np.asarray(y)[keep]).groupby(codes[keep]).agg(reducer)
+        top = top.reindex(np.arange(len(uniques))).values
+
+    return np.asarray(uniques), top
+
+
+def color_ramp(color, n=256):
+    """
+    Shades of a color going from nearly white up to the color itself, used to color how dense a group is
+
+    :param color: hex color
+    :param n: number of shades
+    :return: list of hex colors
+    """
+
+    rgb = np.array([int(color[i:i + 2], 16) for i in (1, 3, 5)], dtype="float64")
+    shades = 255 + np.outer(np.linspace(.1, 1, n), rgb - 255)
+
+    return ["#{:02x}{:02x}{:02x}".format(*shade) for shade in np.round(shades).astype(int)]
+
+
+def held_nbytes(arrays):
+    """
+    :param arrays: arrays, anything else is skipped
+    :return: bytes of process memory the arrays keep alive. Views count the whole array they look into, each array
+             is counted once and memory mapped ones are left out.
+    """
+
+    seen = set()
+    total = 0
+
+    for a in arrays:
+
+        if not isinstance(a, np.ndarray):
+
+            continue
+
+        while not isinstance(a, np.memmap) and isinstance(a.base, np.ndarray):
+
+            a = a.base
+
+        # memory mapped pages belong to the page cache and are shared with other processes
+        if isinstance(a, np.memmap) or id(a) in seen:
+
+            continue
+
+        seen.add(id(a))
+        total += a.nbytes
+
+    return total
+
+
+def split_groups(group, factorized=None, **columns):
+    """
+    Splits columns by group with one factorize and one stable sort. The columns of each group are slices of the sorted
+    columns rather than copies, and groups come out in sorted order. Rows without a group are dropped.
+
+    :param group: group of every row
+    :param factorized: codes and sorted group values if they have already been worked out
+    :param columns: columns to split
+    :return: OrderedDict of group name to dict of columns
+    """
+
+    codes, uniques = factorized if factorized is not None else pd.factorize(group, sort=True)
+    columns = {c: np.asarray(v) for c, v in columns.items()}
+
+    if (codes < 0).any():
+
+        keep = codes >= 0
+        codes = codes[keep]
+        columns = {c: v[keep] for c, v in columns.items()}
+
+    # data that is already ordered by group doesn't need to be sorted
+    if len(codes) and (np.diff(codes) < 0).any():
+
+        order = np.argsort(codes, kind="mergesort")
+        columns = {c: v[order] for c, v in columns.items()}
+
+    bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(uniques)))])
+
+    groups = OrderedDict()
+
+    for i, g in enumerate(uniques):
+
+        groups[str(g)] = {c: v[bounds[i]:bounds[i + 1]] for c, v in columns.items()}
+
+    return groups
 
 
 class GraphPlot:
@@ -31,6 +190,19 @@ class GraphPlot:
         self.plot_width = kwargs.get("plot_width", 600)
         self.plot_height = kwargs.get("plot_height", 600)
 
+        # sources with more rows than this only get the points that are visible at the plot's resolution
+        self.lod_threshold = kwargs.get("lod_threshold", 10000)
+        self.lod_cell = kwargs.get("lod_cell", 2)
+
+        # summaries of the x, y and group columns worked out when they were parsed, see stats.column_stats
+        self.column_stats = kwargs.get("column_stats", {})
+
+        # plots written to standalone html or json have no server to redraw them as they are panned or zoomed
+        self.static = kwargs.get("static", False)
+
+        # milliseconds to throttle slider changes by and to gather range changes for before acting on the latest one
+        self.debounce = dict(DEBOUNCE, **kwargs.get("debounce", {}))
+
         self.file_source = ColumnDataSource({'file_contents': [], 'file_name': []})
         if y is None:
 
@@ -38,38 +210,25 @@ class GraphPlot:
 
                 self.x = x
 
+                groups = split_groups(self.group, kwargs.get("group_codes"), x=self.x)
+
                 # Gets the number of groups
-                self.num_colors = len(set(self.group))
+                self.num_colors = len(groups)
 
                 # Get the colors for the groups and assign then
-                self.palettes = self.palette_maps(self.num_colors)
-                self.palette = self.palettes[kwargs.get("palette", "Accent")]
-                temp_df = pd.DataFrame(list(zip(self.x, self.group)),
-                                       columns=["x", "group"])
-                temp_group = temp_df.groupby("group", as_index=False)
-
-                self.num_mod = floor(len(self.group) / len(self.palette))
-                self.colors = self.palette * self.num_mod
+                self.palette = self.get_palette(kwargs.get("palette", "Accent"))
 
                 self.source = OrderedDict()
 
-                for g in temp_group.groups:
-                    tg = temp_group.get_group(g)
+                for g, columns in groups.items():
 
-                    self.source.update({str(g): ColumnDataSource(data=dict(x=tg["x"].tolist(),
-                                                                           group=[g, ] * len(tg.x.index),
-                                                                           color=[self.palette[
-                                                                                      list(
-                                                                                          temp_group.groups.keys()).index(
-                                                                                          g)], ]
-                                                                                 * len(tg.index)))})
+                    self.source.update({g: ColumnDataSource(data=columns)})
             else:
                 self.x = x
-                self.palettes = self.palette_maps(1)
-                self.palette = self.palettes[kwargs.get("palette", "Accent")]
-                self.colors = self.palette * len(self.x)
+                self.num_colors = 1
+                self.palette = self.get_palette(kwargs.get("palette", "Accent"))
 
-                self.source = ColumnDataSource(data=dict(x=self.x, color=self.colors))
+                self.source = ColumnDataSource(data=dict(x=np.asarray(self.x)))
 
         else:
 
@@ -78,30 +237,19 @@ class GraphPlot:
                 self.x = x
                 self.y = y
 
+                groups = split_groups(self.group, kwargs.get("group_codes"), x=self.x, y=self.y)
+
                 # Gets the number of groups
-                self.num_colors = len(set(self.group))
+                self.num_colors = len(groups)
 
                 # Get the colors for the groups and assign then
-                self.palettes = self.palette_maps(self.num_colors)
-                self.palette = self.palettes[kwargs.get("palette", "Accent")]
-                temp_df = pd.DataFrame(list(zip(self.x, self.y, self.group)),
-                                       columns=["x", "y", "group"])
-                temp_group = temp_df.groupby("group", as_index=False)
-
-                self.num_mod = floor(len(self.group) / len(self.palette))
-                self.colors = self.palette * self.num_mod
+                self.palette = self.get_palette(kwargs.get("palette", "Accent"))
 
                 self.source = OrderedDict()
 
-                for g in temp_group.groups:
+                for g, columns in groups.items():
 
-                    tg = temp_group.get_group(g)
-
-                    self.source.update({str(g): ColumnDataSource(data=dict(x=tg["x"].tolist(), y=tg["y"].tolist(),
-                                                                      group=[g, ]*len(tg.x.index),
-                                                                      color=[self.palette[
-                                                                                 list(temp_group.groups.keys()).index(g)],]
-                                                                            *len(tg.index)))})
+                    self.source.update({g: ColumnDataSource(data=columns)})
             else:
 
                 # if y or x is not equal, 1 will be repeated
@@ -109,23 +257,22 @@ class GraphPlot:
                 if y.size != x.size:
 
                     # repeats the smaller column/list/array
-                    if y.size % x.size == 0 or x.size % y.size == 0:
+                    if x.size and y.size and (y.size % x.size == 0 or x.size % y.size == 0):
 
                         if x.size > y.size:
 
-                            self.x = x.values.flatten()
-                            self.y = y.repeat(x.size/y.size).values
+                            self.x = np.asarray(x).ravel()
+                            self.y = np.repeat(np.asarray(y).ravel(), x.size // y.size)
 
                         elif y.size > x.size:
 
-                            self.y = y.values.flatten()
-                            self.x = x.repeat(y.size / x.size).values
+                            self.y = np.asarray(y).ravel()
+                            self.x = np.repeat(np.asarray(x).ravel(), y.size // x.size)
 
-                        self.palettes = self.palette_maps(1)
-                        self.palette = self.palettes[kwargs.get("palette", "Accent")]
-                        self.colors = self.palette * len(self.y)
+                        self.num_colors = 1
+                        self.palette = self.get_palette(kwargs.get("palette", "Accent"))
 
-                        self.source = ColumnDataSource(data=dict(x=self.x, y=self.y, color=self.colors))
+                        self.source = ColumnDataSource(data=dict(x=self.x, y=self.y))
 
                     else:
 
@@ -135,41 +282,183 @@ class GraphPlot:
 
                     self.x = x
                     self.y = y
-                    self.palettes = self.palette_maps(1)
-                    self.palette = self.palettes[kwargs.get("palette", "Accent")]
-                    self.colors = self.palette * len(self.y)
+                    self.num_colors = 1
+                    self.palette = self.get_palette(kwargs.get("palette", "Accent"))
+
+                    self.source = ColumnDataSource(data=dict(x=np.asarray(self.x), y=np.asarray(self.y)))
 
-                    self.source = ColumnDataSource(data=dict(x=self.x, y=self.y, color=self.colors))
+        # position of each group in the palette
+        self.group_index = OrderedDict((k, i) for i, (k, s) in enumerate(self.sources()))
+
+        # renderers of the current figure by role and group
+        self.renderers = OrderedDict()
 
         self.graph = None
         self.p = None
+
+        # one bar per x value and group, heights are reduced from the rows with bar_reducer
+        self.bar_reducer = kwargs.get("bar_reducer", "sum")
+        self.bar_sources = OrderedDict()
+
+        # density images of each group and the points they are counted from
+        self.density_sources = OrderedDict()
+        self.density_points = OrderedDict()
+        self.density_mappers = OrderedDict()
+
         self.hist_source = None
+        self.hist_sources = OrderedDict()
+        self.hist_index = OrderedDict()
+        self.hist_range = None
+        self.bins = None
+
+        # regression line and band sources of each group for scatter plots
+        self.reg_sources = OrderedDict()
+        self.reg_fits = OrderedDict()
+        self.reg_backlog = OrderedDict()
+        self.reg_fitted = False
+
+        # full resolution columns of the sources that are being decimated
+        self.detail = OrderedDict()
+        self.detail_x = OrderedDict()
+        self.detail_y = OrderedDict()
+        self.detail_kind = None
 
-    def palette_maps(self, n_colors):
+        # buffers the full resolution columns are streamed into, see extend_detail
+        self.detail_buffers = OrderedDict()
+
+        # resampled levels and min/max bands of datetime line plots
+        self.ladders = OrderedDict()
+        self.envelope_sources = OrderedDict()
+
+    def get_palette(self, name):
 
         """
-        Creates the palettes from seaborn for a given number of groups
+        Gets a palette from seaborn for the number of groups. Palettes are cached for the whole process so only the
+        palette that is selected gets built
 
-        :param n_colors: number of colors to assign
-        :return: map of palette names to hex codes
+        :param name: palette name
+        :return: list of hex codes
         """
 
-        palette_map = {}
+        return get_palette(name, self.num_colors)
 
-        for n in pyplot.colormaps():
+    def sources(self):
+        """
+        Data sources paired with their group name, the name is None when there are no groups
 
-            if n == "jet":
+        :return: list of (name, source)
+        """
 
-                continue
+        if self.group is not None:
 
-            palette_map.update({n: seaborn.color_palette(n, n_colors).as_hex()})
+            return list(self.source.items())
 
-        return palette_map
+        return [(None, self.source)]
 
-    def change_palette_lines(self, attr, old, new):
+    def columns(self, key, source):
+        """
+        Full resolution data of a source, even if only part of it is being drawn
 
+        :param key: group name
+        :param source: data source
+        :return: dict of columns
         """
-        Changes the color palette for lines
+
+        return self.detail.get(key, source.data)
+
+    def add_level_of_detail(self, kind):
+        """
+        Only sends the browser the points that can be seen at the plot's resolution once the data gets large. The
+        points are picked again whenever the plot is panned or zoomed.
+
+        :param kind: "line" keeps the min/max of each pixel column, "scatter" keeps a point per occupied grid cell and
+                     "resample" draws the mean of time buckets sized to the zoom with a min/max band
+        :return: None
+        """
+
+        sources = self.sources()
+
+        if sum(len(s.data["x"]) for k, s in sources) <= self.lod_threshold:
+
+            return
+
+        for k, s in sources:
+
+            x = decimate.as_float(s.data["x"])
+            y = decimate.as_float(s.data["y"])
+
+            if x is None or y is None:
+
+                self.detail_x.clear()
+                self.detail_y.clear()
+
+                return
+
+            self.detail_x[k] = x
+            self.detail_y[k] = y
+
+        for k, s in sources:
+
+            self.detail[k] = dict(s.data)
+
+            if kind == "resample":
+
+                self.ladders[k] = decimate.ResampleLadder(self.detail_x[k], self.detail_y[k])
+
+        self.detail_kind = kind
+
+        # fix the ranges to the full data so resetting the plot does not shrink it to what is being drawn
+        x_start, x_end = self.padded(*(self.known_range("x") or self.value_range(self.detail_x.values())))
+        y_start, y_end = self.padded(*(self.known_range("y") or self.value_range(self.detail_y.values())))
+
+        self.p.x_range = Range1d(x_start, x_end)
+        self.p.y_range = Range1d(y_start, y_end)
+
+        # a pan or zoom changes several range ends at once, they are picked up together
+        self.watch_ranges(self.refresh_detail)
+        self.refresh_detail(None, None, None)
+
+    @staticmethod
+    def value_range(arrays):
+        """
+        :param arrays: float arrays
+        :return: (min, max) over all of the arrays
+        """
+
+        return min(np.nanmin(a) for a in arrays if len(a)), max(np.nanmax(a) for a in arrays if len(a))
+
+    @staticmethod
+    def padded(lo, hi, pad=.05):
+        """
+        :param lo: start of a range
+        :param hi: end of a range
+        :param pad: fraction of the range to add either side
+        :return: (start, end)
+        """
+
+        margin = (hi - lo) * pad or 1
+
+        return lo - margin, hi + margin
+
+    def known_range(self, column):
+        """
+        Range of a column from its summary, so it can be had without a pass over the data
+
+        :param column: "x" or "y"
+        :return: (min, max) as floats or None if there is no summary
+        """
+
+        summary = self.column_stats.get(column)
+
+        if not summary or summary["min"] is None:
+
+            return None
+
+        return summary["min"], summary["max"]
+
+    def refresh_detail(self, attr, old, new):
+        """
+        Picks the points to draw for the visible ranges
 
         :param attr: attribute changes
         :param old: old value
@@ -177,22 +466,126 @@ class GraphPlot:
         :return: None
         """
 
-        # get new palette colors
-        self.palette = self.palettes[new]
+        x_start, x_end = self.p.x_range.start, self.p.x_range.end
+        y_start, y_end = self.p.y_range.start, self.p.y_range.end
 
-        # get glyphs
-        renderer = [r for r in self.p.renderers if isinstance(r, GlyphRenderer)]
+        # the groups share one point budget, each is sampled on a grid with cells scaled up to its share of the plot
+        share = np.sqrt(max(len(self.detail), 1))
+        nx = max(int(self.plot_width // self.lod_cell / share), 1)
+        ny = max(int(self.plot_height // self.lod_cell / share), 1)
 
-        # assign colors to renderers
-        for r in renderer:
-            ds = r.data_source
+        for k, s in self.sources():
 
-            self.colors = [self.palette[renderer.index(r)], ] * len(ds.data["color"])
-            r.glyph.line_color = self.colors[0]
+            if k not in self.detail:
 
-    def change_palette_scatter(self, attr, old, new):
+                continue
+
+            x = self.detail_x[k]
+            y = self.detail_y[k]
+
+            if self.detail_kind == "resample":
+
+                window = self.ladders[k].window(x_start, x_end, self.plot_width)
+
+                if window is not None:
+
+                    s.data = dict(x=window["x"], y=window["mean"])
+                    self.envelope_sources[k].data = dict(x=window["x"], lower=window["lower"], upper=window["upper"])
+
+                    continue
+
+                # zoomed in far enough for the raw points
+                self.envelope_sources[k].data = dict(x=[], lower=[], upper=[])
+
+            if self.detail_kind in ("line", "resample"):
+
+                idx = decimate.minmax_lines(x, y, x_start, x_end, self.plot_width)
+
+            else:
+
+                idx = decimate.grid_sample(x, y, x_start, x_end, y_start, y_end, nx, ny)
+
+            s.data = {c: v[idx] for c, v in self.detail[k].items()}
+
+    def coalesce(self, name, callback, model):
         """
-        Change palette for scatter plots
+        Wraps a callback so a burst of changes to a control only runs it with the latest value, at most once per the
+        control's debounce interval
+
+        :param name: control name in the debounce settings
+        :param callback: on_change callback
+        :param model: model the callback is attached to
+        :return: wrapped callback
+        """
+
+        return CoalescedCallback(callback, self.debounce.get(name, 0), model)
+
+    def watch_ranges(self, callback):
+        """
+        Runs a callback when the plot is panned or zoomed. Static plots have no server to run it and don't listen.
+
+        :param callback: on_change callback
+        :return: None
+        """
+
+        if self.static:
+
+            return
+
+        refresh = self.coalesce("range", callback, self.p)
+
+        for r in (self.p.x_range, self.p.y_range):
+
+            r.on_change("start", refresh)
+            r.on_change("end", refresh)
+
+    def slider(self, name, **kwargs):
+        """
+        Slider whose value_throttled changes at most once per the control's debounce interval while it is dragged
+
+        :param name: control name in the debounce settings
+        :param kwargs: slider attributes
+        :return: Slider
+        """
+
+        return Slider(callback_throttle=self.debounce.get(name, 0), **kwargs)
+
+    def register(self, role, key, renderer):
+        """
+        Keeps a renderer so the style callbacks can get to it without searching the figure
+
+        :param role: what the renderer draws, "data", "reg_line", "error" or "hist"
+        :param key: group name
+        :param renderer: glyph renderer
+        :return: the renderer
+        """
+
+        self.renderers.setdefault(role, OrderedDict())[key] = renderer
+
+        return renderer
+
+    def renderers_of(self, *roles):
+        """
+        :param roles: renderer roles
+        :return: list of the renderers with those roles
+        """
+
+        return [r for role in roles for r in self.renderers.get(role, {}).values()]
+
+    def colored(self, role):
+        """
+        Renderers of a role paired with the color of their group
+
+        :param role: renderer role
+        :return: list of (color, renderer)
+        """
+
+        return [(self.palette[self.group_index[k]], r) for k, r in self.renderers.get(role, {}).items()]
+
+    def change_palette_lines(self, attr, old, new):
+
+        """
+        Changes the color palette for lines
 
         :param attr: attribute changes
         :param old: old value
@@ -200,35 +593,38 @@ class GraphPlot:
         :return: None
         """
 
-        self.palette = self.palettes[new]
-
-        renderer = [r for r in self.p.renderers if isinstance(r, GlyphRenderer)]
+        # get new palette colors
+        self.palette = self.get_palette(new)
 
-        for r in renderer:
+        # assign colors to renderers
+        for color, r in self.colored("data"):
 
-            ds = r.data_source
+            r.glyph.line_color = color
 
-            temp_palette = []
+        for color, r in self.colored("envelope"):
 
-            for p in self.palette:
+            r.glyph.fill_color = color
 
-                temp_palette.extend([p, ] * 3)
+    def change_palette_scatter(self, attr, old, new):
+        """
+        Change palette for scatter plots
 
-            try:
-                self.colors = [temp_palette[renderer.index(r)], ] * len(ds.data["color"])
+        :param attr: attribute changes
+        :param old: old value
+        :param new: new value
+        :return: None
+        """
 
-            except KeyError:
+        self.palette = self.get_palette(new)
 
-                if r.name == "reg_line":
+        for color, r in self.colored("data") + self.colored("error"):
 
-                    r.glyph.line_color = [temp_palette[renderer.index(r)], ][0]
+            r.glyph.fill_color = color
+            r.glyph.line_color = color
 
-                if r.name == "error":
-                    r.glyph.fill_color = [temp_palette[renderer.index(r)], ][0]
-                    r.glyph.line_color = [temp_palette[renderer.index(r)], ][0]
+        for color, r in self.colored("reg_line"):
 
-            if r.name != "reg_line" and r.name != "error":
-                ds.data["color"] = self.colors
+            r.glyph.line_color = color
 
     def change_palette_hist(self, attr, old, new):
         """
@@ -240,85 +636,77 @@ class GraphPlot:
         :return: None
         """
 
-        self.palette = self.palettes[new]
+        self.palette = self.get_palette(new)
 
-        renderer = [r for r in self.p.renderers if isinstance(r, GlyphRenderer)]
+        for color, r in self.colored("hist"):
 
-        for r in renderer:
+            if r.glyph.line_color == r.glyph.fill_color:
 
-            ds = r.data_source
-            self.colors = [(self.palette*3)[renderer.index(r)], ] * len(ds.data["color"])
+                r.glyph.line_color = color
 
-            ds.data["color"] = self.colors
+            r.glyph.fill_color = color
 
     def change_hist_line(self, attr, old, new):
 
-        renderer = [r for r in self.p.renderers if isinstance(r, GlyphRenderer)]
-
-        for r in renderer:
-
-            ds = r.data_source
+        for r in self.renderers_of("hist"):
 
             if new == [0]:
 
                 r.glyph.line_color = "black"
 
             else:
-                r.glyph.line_color = ds.data["color"][0]
+                r.glyph.line_color = r.glyph.fill_color
 
     def change_bins(self, attr, old, new):
 
-        renderer = [r for r in self.p.renderers if isinstance(r, GlyphRenderer)]
-
-        if self.group is not None:
+        self.bins = new
 
-            for r in renderer:
+        # the bars are updated in place, the glyphs and their styling stay as they are
+        for k, s in self.sources():
 
-                self.p.renderers.remove(r)
+            self.hist_sources[k].data = self.histogram_data(k, s, new)
 
-            for k in self.source.keys():
-                cuts = pd.Series(pd.cut(self.source[k].data["x"], new)).str.replace("\(|\]", "").str.split(", ",
-                                                                                                           expand=True).astype(
-                    float)
+    def refresh_histogram(self):
 
-                cuts = cuts.groupby([0, 1], as_index=False).size().reset_index(name="freq")
+        # every group is binned over the range of the whole column, which new rows can change, so all the indexes
+        # are built again
+        self.hist_index.clear()
+        self.hist_range = None
+        self.change_bins(None, None, self.bins)
 
-                self.hist_source = ColumnDataSource(data=dict(min=cuts[0].tolist(), max=cuts[1].tolist(),
-                                                              freq=cuts["freq"].tolist(),
-                                                              color=[self.source[k].data["color"][0], ] * len(
-                                                                  cuts.index)))
+    def histogram_data(self, key, source, bins):
+        """
+        Bins the x values of a source. An index of the values is built on the first call and shared by every later bin
+        count.
 
-                self.p.quad(left="min", right="max", bottom=0, top="freq", source=self.hist_source, line_color="black",
-                            color="color")
-        else:
+        :param key: group name
+        :param source: data source
+        :param bins: number of bins
+        :return: dict of histogram columns
+        """
 
-            for r in renderer:
+        if key not in self.hist_index:
 
-                self.p.renderers.remove(r)
+            # every group is binned over the range of the whole column
+            if self.hist_range is None:
 
-            cuts = pd.cut(self.source.data["x"], new).str.replace("\(|\]", "").str.split(", ", expand=True).astype(
-                float)
+                self.hist_range = self.known_range("x") or self.value_range(
+                    [decimate.as_float(self.columns(k, s)["x"]) for k, s in self.sources()])
 
-            cuts = cuts.groupby([0, 1], as_index=False).size().reset_index(name="freq")
+            self.hist_index[key] = HistogramIndex(decimate.as_float(self.columns(key, source)["x"]),
+                                                  value_range=self.hist_range)
 
-            self.hist_source = ColumnDataSource(data=dict(min=cuts[0].tolist(), max=cuts[1].tolist(),
-                                                          freq=cuts["freq"].tolist(),
-                                                          color=[self.source.data["color"][0], ] * len(cuts.index)))
+        left, right, freq = self.hist_index[key].histogram(bins)
 
-            self.p.quad(left="min", right="max", bottom=0, top="freq", source=self.hist_source, line_color="black",
-                        color="color")
+        return dict(min=left, max=right, freq=freq)
 
     def change_palette_bar(self, attr, old, new):
 
-        self.palette = self.palettes[new]
-
-        renderer = [r for r in self.p.renderers if isinstance(r, GlyphRenderer)]
+        self.palette = self.get_palette(new)
 
-        for r in renderer:
-            ds = r.data_source
+        for color, r in self.colored("data"):
 
-            self.colors = [self.palette[renderer.index(r)], ] * len(ds.data["color"])
-            r.glyph.fill_color = self.colors[0]
+            r.glyph.fill_color = color
 
     def change_dot_size(self, attr, old, new):
 
@@ -331,8 +719,7 @@ class GraphPlot:
         :return: None
         """
 
-        renderer = [r for r in self.p.renderers if isinstance(r, GlyphRenderer)]
-        for r in renderer:
+        for r in self.renderers_of("data"):
 
             try:
                 r.glyph.size = new
@@ -350,8 +737,7 @@ class GraphPlot:
         :return: None
         """
 
-        renderer = [r for r in self.p.renderers if isinstance(r, GlyphRenderer)]
-        for r in renderer:
+        for r in self.renderers_of("data"):
 
             r.glyph.line_width = new
 
@@ -404,112 +790,402 @@ class GraphPlot:
         :return: None
         """
 
-        renderer = [r for r in self.p.renderers if isinstance(r, GlyphRenderer)]
-
-        for r in renderer:
+        for r in self.renderers_of("data", "hist"):
 
             try:
-                if r.name == "error":
-
-                    r.glyph.fill_alpha = new*.2
-
-                else:
-
-                    r.glyph.fill_alpha = new
+                r.glyph.fill_alpha = new
 
             except AttributeError:
                 pass
 
+        for r in self.renderers_of("error"):
+
+            r.glyph.fill_alpha = new*.2
+
     def add_regression(self, attr, old, new):
 
         if new:
 
             self.reg_err_check.disabled = False
 
-            renderer = [r for r in self.p.renderers if r.name == "reg_line"]
-            for r in renderer:
+            if not self.reg_fitted:
 
-                r.visible = True
+                self.fit_regressions()
 
-        else:
+            for r in self.renderers_of("reg_line"):
 
-            renderer = [r for r in self.p.renderers if isinstance(r, GlyphRenderer)]
+                r.visible = True
 
-            for r in renderer:
+        else:
 
-                if r.name == "reg_line" or r.name == "error":
+            for r in self.renderers_of("reg_line", "error"):
 
-                    r.visible = False
+                r.visible = False
 
             self.reg_err_check.active = [1]
             self.reg_err_check.disabled = True
 
-    def add_reg_error(self, attr, old, new):
+    def fit_regressions(self):
+        """
+        Fits the regression of every group on the worker pool. Each fit is pushed to the plot on the next tick once it
+        is done. Without a document to push to the fits are done straight away.
 
-        renderer = [r for r in self.p.renderers if isinstance(r, GlyphRenderer)]
+        :return: None
+        """
 
-        if new == [0]:
+        self.reg_fitted = True
+        self.reg_check.labels = ["Regression Line"]
 
-            for r in renderer:
+        doc = self.p.document
 
-                if r.name == "error":
+        for k, s in self.sources():
 
-                    r.visible = True
-        else:
+            columns = self.columns(k, s)
+
+            if doc is None:
+
+                self.show_regression(k, fit_line(columns["x"], columns["y"]))
+
+                continue
+
+            # rows streamed in while the fit is running are held here and added once it is done
+            self.reg_backlog[k] = []
+
+            future = fit_pool.submit(fit_line, columns["x"], columns["y"])
+            future.add_done_callback(partial(self.push_regression, doc, k))
+
+    def push_regression(self, doc, key, future):
+
+        error = future.exception()
 
-            for r in renderer:
+        if error is not None:
 
-                if r.name == "error":
+            doc.add_next_tick_callback(partial(self.show_regression_error, key, error))
 
-                    r.visible = False
+            return
 
-    def update(self, x, y, c, g=None, source=None):
+        doc.add_next_tick_callback(partial(self.show_regression, key, future.result()))
+
+    def show_regression_error(self, key, error):
+        """
+        Reports a fit that failed and unticks the regression, so ticking it again fits every group again
+
+        :param key: group name
+        :param error: exception raised by the fit
+        :return: None
+        """
+
+        self.reg_backlog.pop(key, None)
+        self.reg_fitted = False
+
+        self.reg_check.labels = ["Regression Line (couldn't fit: {})".format(error)]
+        self.reg_check.active = []
+
+    def show_regression(self, key, fit):
+        """
+        Keeps a finished fit and draws it
+
+        :param key: group name
+        :param fit: LinearFit
+        :return: None
+        """
+
+        for x, y, sign in self.reg_backlog.pop(key, []):
+
+            fit = self.change_fit(fit, x, y, sign)
+
+        self.reg_fits[key] = fit
+        self.draw_regression(key)
+
+    def draw_regression(self, key):
+
+        reg_x, reg_y, band_x, bounds = regression_band(self.reg_fits[key])
+        line_source, band_source = self.reg_sources[key]
+
+        line_source.data = dict(x=reg_x, y=reg_y)
+        band_source.data = dict(x=band_x, y=bounds)
+
+    @staticmethod
+    def change_fit(fit, x, y, sign):
+        """
+        Applies a change in the data to a fit
+
+        :param fit: LinearFit
+        :param x: x values
+        :param y: y values
+        :param sign: 1 when the rows were added, -1 when they were dropped and 0 when they replace everything
+        :return: LinearFit
+        """
+
+        if sign == 0:
+
+            return fit_line(x, y)
+
+        if sign > 0:
+
+            return fit.add(decimate.as_float(x), decimate.as_float(y))
+
+        return fit.remove(decimate.as_float(x), decimate.as_float(y))
+
+    def track_regression(self, key, x, y, sign):
+        """
+        Keeps the regression of a source in step with its data, only the rows that changed are looked at
+
+        :param key: group name
+        :param x: x values
+        :param y: y values
+        :param sign: 1 when the rows were added, -1 when they were dropped and 0 when they replace everything
+        :return: None
+        """
+
+        if key in self.reg_backlog:
+
+            self.reg_backlog[key].append((x, y, sign))
+
+            return
+
+        if key not in self.reg_fits:
+
+            return
+
+        self.reg_fits[key] = self.change_fit(self.reg_fits[key], x, y, sign)
+
+    def nbytes(self):
+        """
+        Bytes held by the plot's data, its sources and the full resolution columns, indexes and resampled levels kept
+        for redrawing it
+
+        :return: bytes
+        """
+
+        arrays = [v for k, s in self.sources() for v in s.data.values()]
+        arrays += [v for columns in self.detail.values() for v in columns.values()]
+        arrays += list(self.detail_x.values()) + list(self.detail_y.values())
+        arrays += [index.values for index in self.hist_index.values()]
+        arrays += [v for points in self.density_points.values() for v in points]
+
+        for ladder in self.ladders.values():
+
+            arrays += [ladder.x, ladder.y] + [b.values for level in ladder.cache.values() for b in level.values()]
+
+        return held_nbytes(arrays)
+
+    def source_key(self, source):
+
+        return [k for k, s in self.sources() if s is source][0]
+
+    def add_reg_error(self, attr, old, new):
+
+        for r in self.renderers_of("error"):
+
+            r.visible = new == [0]
+
+    def update(self, x, y, source=None):
         """
         Update new values on plot
 
         :param x: x values
         :param y: y values
-        :param c: colors
-        :param g: groups
         :param source: data source
         :return: None
         """
 
-        # remove existing data
-        if source:
+        if source is None:
+
+            source = self.source
+
+        key = self.source_key(source)
+        x = np.asarray(x)
+        y = np.asarray(y)
 
-            source.data["color"] = []
+        # the summaries no longer describe the data
+        self.column_stats = {}
+
+        if key in self.detail:
+
+            # keep the new values at full resolution and draw the visible part
+            self.set_detail(key, x, y)
+
+        else:
+
+            # remove existing data
             source.data["x"] = []
             source.data["y"] = []
 
-        else:
+            # reassign
+            source.stream(dict(x=x, y=y))
 
-            self.source.data["color"] = []
-            self.source.data["x"] = []
-            self.source.data["y"] = []
+        self.track_regression(key, x, y, 0)
 
-        if self.group is not None:
+        if key in self.reg_fits:
 
-            if source:
+            self.draw_regression(key)
 
-                source.data["group"] = []
-                # reassign
-                source.stream(dict(x=x, y=y, color=c, group=g))
+        if self.bar_sources:
 
-            else:
+            self.refresh_bars()
+
+        if self.hist_sources:
+
+            self.refresh_histogram()
+
+        if self.density_sources:
+
+            self.density_points.clear()
+            self.refresh_density(None, None, None)
+
+    def stream(self, x, y, source=None, rollover=None):
+        """
+        Append new values to the plot. The regression is updated from the new rows and the rows that roll off.
+
+        :param x: x values
+        :param y: y values
+        :param source: data source
+        :param rollover: maximum number of rows to keep
+        :return: None
+        """
+
+        if source is None:
+
+            source = self.source
+
+        key = self.source_key(source)
+        x = np.asarray(x)
+        y = np.asarray(y)
+
+        self.column_stats = {}
+
+        columns = self.columns(key, source)
+        dropped = 0
+
+        if rollover is not None:
+
+            # rows that would roll straight off again are never added, so the fit and the columns drop the same rows
+            if len(x) > rollover:
 
-                self.source.data["group"] = []
-                self.source.stream(dict(x=x, y=y, color=c, group=g))
+                x = x[len(x) - rollover:]
+                y = y[len(y) - rollover:]
+
+            dropped = max(len(columns["x"]) + len(x) - rollover, 0)
+
+        if dropped:
+
+            dropped_x = decimate.as_float(columns["x"][:dropped])
+            self.track_regression(key, columns["x"][:dropped], columns["y"][:dropped], -1)
+
+        if key in self.detail:
+
+            self.extend_detail(key, x, y, dropped)
 
         else:
 
-            if source:
+            source.stream(dict(x=x, y=y), rollover)
+
+        self.track_regression(key, x, y, 1)
+
+        if key in self.reg_fits:
+
+            fit = self.reg_fits[key]
 
-                source.stream(dict(x=x, y=y, color=c))
+            # dropping rows can shrink the range the line is drawn over, the rows left are only looked through when
+            # the dropped rows held one of its ends
+            if dropped and dropped_x is not None and np.isfinite(dropped_x).any() and \
+                    (np.nanmin(dropped_x) <= fit.x_min[0] or np.nanmax(dropped_x) >= fit.x_max[0]):
+
+                remaining = decimate.as_float(self.columns(key, source)["x"])
+                finite = remaining[np.isfinite(remaining)]
+                fit.x_min[0] = finite.min() if len(finite) else np.inf
+                fit.x_max[0] = finite.max() if len(finite) else -np.inf
+
+            self.draw_regression(key)
+
+        if self.bar_sources:
+
+            self.refresh_bars()
+
+        if self.hist_sources:
+
+            self.refresh_histogram()
+
+        if self.density_sources:
+
+            self.density_points.clear()
+            self.refresh_density(None, None, None)
+
+    def set_detail(self, key, x, y):
+
+        self.detail_buffers.pop(key, None)
+
+        self.detail[key] = dict(x=x, y=y)
+        self.detail_x[key] = decimate.as_float(x)
+        self.detail_y[key] = decimate.as_float(y)
+
+        if self.detail_kind == "resample":
+
+            self.ladders[key] = decimate.ResampleLadder(self.detail_x[key], self.detail_y[key])
+
+        self.refresh_detail(None, None, None)
+
+    def extend_detail(self, key, x, y, dropped):
+        """
+        Appends rows to the full resolution columns of a decimated source and drops the oldest ones. The kept rows
+        are only copied when the buffers holding them have to grow, and only the resampled buckets the changed rows
+        fall in are worked out again.
+
+        :param key: group name
+        :param x: x values to append
+        :param y: y values to append
+        :param dropped: number of rows rolling off the front
+        :return: None
+        """
+
+        if key not in self.detail_buffers:
+
+            # float columns that are already floats are the raw columns, they share a buffer
+            buffers = {}
+            columns = (self.detail[key]["x"], self.detail[key]["y"], self.detail_x[key], self.detail_y[key])
+
+            self.detail_buffers[key] = [buffers.setdefault(id(c), decimate.ColumnBuffer(c)) for c in columns]
+
+        float_x = decimate.as_float(x)
+        float_y = decimate.as_float(y)
+
+        ladder = self.ladders.get(key)
+
+        if ladder is not None:
+
+            # the ladder only keeps rows with a finite time and value
+            finite = int((np.isfinite(self.detail_x[key][:dropped]) & np.isfinite(self.detail_y[key][:dropped])).sum())
+
+        appended = set()
+
+        for buffer, values in zip(self.detail_buffers[key], (x, y, float_x, float_y)):
+
+            if id(buffer) not in appended:
+
+                appended.add(id(buffer))
+                buffer.drop(dropped)
+                buffer.append(values)
+
+        raw_x, raw_y, detail_x, detail_y = [b.values for b in self.detail_buffers[key]]
+
+        self.detail[key] = dict(x=raw_x, y=raw_y)
+        self.detail_x[key] = detail_x
+        self.detail_y[key] = detail_y
+
+        if ladder is not None:
+
+            if dropped and not ladder.ordered:
+
+                # rows that came in out of time order are spread through the ladder, so it is built again
+                self.ladders[key] = decimate.ResampleLadder(detail_x, detail_y)
 
             else:
 
-                self.source.stream(dict(x=x, y=y, color=c))
+                ladder.drop(finite)
+                ladder.append(float_x, float_y)
+
+        self.refresh_detail(None, None, None)
 
     def plot_scatter(self):
         """
@@ -521,78 +1197,195 @@ class GraphPlot:
         # set figure
         self.p = figure(plot_width=self.plot_width, plot_height=self.plot_height,
                         x_axis_label=self.x_axis_label, y_axis_label=self.y_axis_label)
+        self.renderers = OrderedDict()
 
         y_axis_label = TextInput(placeholder="y-axis label")
         x_axis_label = TextInput(placeholder="x-axis label")
 
+        for i, (k, s) in enumerate(self.sources()):
+
+            self.register("data", k, self.p.scatter("x", "y", color=self.palette[i], source=s))
+
+            # the regression is only fitted once it is switched on, until then the line and band are empty
+            line_source = ColumnDataSource(data=dict(x=[], y=[]))
+            band_source = ColumnDataSource(data=dict(x=[], y=[]))
+
+            self.register("reg_line", k, self.p.line("x", "y", source=line_source, name="reg_line",
+                                                     color=self.palette[i], visible=False))
+            self.register("error", k, self.p.patch("x", "y", source=band_source, color=self.palette[i], alpha=.2,
+                                                   name="error", visible=False))
+
+            self.reg_sources[k] = (line_source, band_source)
+
         # handle groups
         if self.group is not None:
 
-            # plot each line
-            for k in self.source.keys():
+            legend = Legend(items=[(k, [r]) for k, r in self.renderers["data"].items()], location=(0, -30))
 
-                self.p.scatter("x", "y", color="color", source=self.source[k])
-                reg_x, reg_y, pred_upper, pred_lower = get_regression_line(self.source[k].data["x"],
-                                                                           self.source[k].data["y"])
+            self.p.add_layout(legend, 'left')
 
-                self.p.line(reg_x, reg_y, name="reg_line", color=self.source[k].data["color"][0])
+        self.add_level_of_detail("scatter")
 
-                bands = sorted(list(zip(pred_upper.tolist(), pred_lower.tolist(), reg_x)), key=lambda z: z[2])
-                band_x = [t[2] for t in bands] + [t[2] for t in bands][::-1]
-                bounds = [t[1] for t in bands] + [t[0] for t in bands][::-1]
+        select_pal = Select(options=palette_names())
+        title_text = TextInput(placeholder="Figure Title")
 
-                self.p.patch(band_x, bounds, color=self.source[k].data["color"][0], alpha=.2, name="error")
-                rends = [r for r in self.p.renderers]
+        dot_size_slider = self.slider("dot_size", start=1, end=100, value=1, step=1, title="Dot Size")
+        alpha_slider = self.slider("alpha", start=0, end=1, value=1, step=.01, title="Transparency")
+        self.reg_check = CheckboxGroup(labels=["Regression Line"])
+        self.reg_err_check = CheckboxGroup(labels=["Error Region"], disabled=True)
 
-                for r in rends:
+        dot_size_slider.on_change("value_throttled", self.change_dot_size)
+        select_pal.on_change("value", self.change_palette_scatter)
+        title_text.on_change("value", self.change_figure_title)
+        alpha_slider.on_change("value_throttled", self.change_glyph_alpha)
 
-                    if r.name in ["reg_line", "error"]:
+        self.reg_check.on_change("active", self.add_regression)
+        self.reg_err_check.on_change("active", self.add_reg_error)
+        y_axis_label.on_change("value", self.change_figure_yaxis)
+        x_axis_label.on_change("value", self.change_figure_xaxis)
+
+        app_layout = layout([[title_text],
+                             [y_axis_label, self.p],
+                             [Spacer(height=10, width=500), x_axis_label],
+                             [select_pal],
+                             [dot_size_slider],
+                             [alpha_slider],
+                             [self.reg_check, self.reg_err_check]])
 
-                        r.visible = False
+        return app_layout
 
-            legend = Legend(items=[*list(zip(list(self.source.keys()),
-                                             [[r] for r in self.p.renderers if isinstance(r, GlyphRenderer)
-                                              and r.name not in ["reg_line", "error"]]))],
-                            location=(0, -30))
+    def density_data(self, key, source):
+        """
+        Counts the points of a group on a grid over the visible ranges with a cell every lod_cell pixels. Empty cells
+        are left out of the image so the groups underneath show through.
 
-            self.p.add_layout(legend, 'left')
+        :param key: group name
+        :param source: data source
+        :return: dict of image columns
+        """
 
-        else:
+        if key not in self.density_points:
+
+            columns = self.columns(key, source)
+            self.density_points[key] = (decimate.as_float(columns["x"]), decimate.as_float(columns["y"]))
+
+        x, y = self.density_points[key]
+        x_start, x_end = self.p.x_range.start, self.p.x_range.end
+        y_start, y_end = self.p.y_range.start, self.p.y_range.end
 
-            self.p.scatter('x', 'y', color="color", source=self.source)
+        nx = max(int(self.plot_width // self.lod_cell), 1)
+        ny = max(int(self.plot_height // self.lod_cell), 1)
 
-            reg_x, reg_y, pred_upper, pred_lower = get_regression_line(self.source.data["x"], self.source.data["y"])
+        counts = decimate.density_grid(x, y, x_start, x_end, y_start, y_end, nx, ny).astype("float32")
+        counts[counts == 0] = np.nan
 
-            self.p.line(reg_x, reg_y, name="reg_line", color=self.source.data["color"][0])
+        return dict(image=[counts], x=[x_start], y=[y_start], dw=[x_end - x_start], dh=[y_end - y_start])
 
-            bands = sorted(list(zip(pred_upper.tolist(), pred_lower.tolist(), reg_x)), key=lambda z: z[2])
-            band_x = [t[2] for t in bands] + [t[2] for t in bands][::-1]
-            bounds = [t[1] for t in bands] + [t[0] for t in bands][::-1]
+    def refresh_density(self, attr, old, new):
+        """
+        Bins the points again for the visible ranges, so zooming in shows more detail
 
-            self.p.patch(band_x, bounds, color=self.source.data["color"][0], alpha=.2, name="error")
-            rends = [r for r in self.p.renderers]
+        :param attr: attribute changes
+        :param old: old value
+        :param new: new value
+        :return: None
+        """
 
-            for r in rends:
+        for k, s in self.sources():
 
-                if r.name in ["reg_line", "error"]:
+            data = self.density_data(k, s)
+            self.density_sources[k].data = data
 
-                    r.visible = False
+            # color scale runs from one point up to the densest cell
+            densest = np.nanmax(data["image"][0]) if np.isfinite(data["image"][0]).any() else 1
+            self.density_mappers[k].high = max(densest, 2)
 
-        select_pal = Select(options=[c for c in pyplot.colormaps() if c != "jet"])
-        title_text = TextInput(placeholder="Figure Title")
+    def change_palette_density(self, attr, old, new):
 
-        dot_size_slider = Slider(start=1, end=100, value=1, step=1, title="Dot Size")
-        alpha_slider = Slider(start=0, end=1, value=1, step=.01, title="Transparency")
-        reg_check = CheckboxGroup(labels=["Regression Line"])
-        self.reg_err_check = CheckboxGroup(labels=["Error Region"], disabled=True)
+        self.palette = self.get_palette(new)
 
-        dot_size_slider.on_change("value", self.change_dot_size)
-        select_pal.on_change("value", self.change_palette_scatter)
-        title_text.on_change("value", self.change_figure_title)
-        alpha_slider.on_change("value", self.change_glyph_alpha)
+        for i, (k, mapper) in enumerate(self.density_mappers.items()):
 
-        reg_check.on_change("active", self.add_regression)
-        self.reg_err_check.on_change("active", self.add_reg_error)
+            mapper.palette = color_ramp(self.palette[i])
+
+        for color, r in self.colored("swatch"):
+
+            r.glyph.fill_color = color
+            r.glyph.line_color = color
+
+    def change_density_alpha(self, attr, old, new):
+
+        for r in self.renderers_of("density"):
+
+            r.glyph.global_alpha = new
+
+    def plot_density(self):
+        """
+        Plot the density of the points of every group as an image. The points are counted on a grid of the plot's
+        resolution on the server, so only the grid is sent to the browser however many points there are.
+
+        :return: layout
+        """
+
+        self.p = figure(plot_width=self.plot_width, plot_height=self.plot_height, x_axis_type=self.x_axis_type,
+                        x_axis_label=self.x_axis_label, y_axis_label=self.y_axis_label, title=self.plot_title)
+        self.renderers = OrderedDict()
+
+        sources = self.sources()
+
+        for k, s in sources:
+
+            columns = self.columns(k, s)
+
+            if "y" not in columns:
+
+                raise ValueError("Density plots need a y column")
+
+            self.density_points[k] = (decimate.as_float(columns["x"]), decimate.as_float(columns["y"]))
+
+            if self.density_points[k][0] is None or self.density_points[k][1] is None:
+
+                raise ValueError("Density plots need numeric or date x and y columns")
+
+        x_range = self.known_range("x") or self.value_range([x for x, y in self.density_points.values()])
+        y_range = self.known_range("y") or self.value_range([y for x, y in self.density_points.values()])
+
+        self.p.x_range = Range1d(*self.padded(*x_range))
+        self.p.y_range = Range1d(*self.padded(*y_range))
+
+        y_axis_label = TextInput(placeholder="y-axis label")
+        x_axis_label = TextInput(placeholder="x-axis label")
+
+        for i, (k, s) in enumerate(sources):
+
+            self.density_mappers[k] = LogColorMapper(palette=color_ramp(self.palette[i]), low=1, high=2,
+                                                     nan_color="rgba(0, 0, 0, 0)")
+            self.density_sources[k] = ColumnDataSource(data=self.density_data(k, s))
+
+            self.register("density", k, self.p.image(image="image", x="x", y="y", dw="dw", dh="dh",
+                                                     color_mapper=self.density_mappers[k],
+                                                     source=self.density_sources[k]))
+
+            # images have no legend glyph, an empty square stands in for each group
+            self.register("swatch", k, self.p.square([], [], color=self.palette[i]))
+
+        self.refresh_density(None, None, None)
+
+        if self.group is not None:
+
+            legend = Legend(items=[(k, [r]) for k, r in self.renderers["swatch"].items()], location=(0, -30))
+
+            self.p.add_layout(legend, 'left')
+
+        self.watch_ranges(self.refresh_density)
+
+        select_pal = Select(options=palette_names())
+        title_text = TextInput(placeholder="Figure Title")
+        alpha_slider = self.slider("alpha", start=0, end=1, value=1, step=.01, title="Transparency")
+
+        select_pal.on_change("value", self.change_palette_density)
+        title_text.on_change("value", self.change_figure_title)
+        alpha_slider.on_change("value_throttled", self.change_density_alpha)
         y_axis_label.on_change("value", self.change_figure_yaxis)
         x_axis_label.on_change("value", self.change_figure_xaxis)
 
@@ -600,12 +1393,76 @@ class GraphPlot:
                              [y_axis_label, self.p],
                              [Spacer(height=10, width=500), x_axis_label],
                              [select_pal],
-                             [dot_size_slider],
-                             [alpha_slider],
-                             [reg_check, self.reg_err_check]])
+                             [alpha_slider]])
 
         return app_layout
 
+    def bar_data(self):
+        """
+        Aggregates every group to its bars and dodges the groups so they sit side by side within the spacing of the x
+        values. Text x values are placed on a factor range instead, with the groups nested inside each value.
+
+        :return: OrderedDict of group name to bar columns and the factors of the x range, None for a numeric range
+        """
+
+        bars = OrderedDict()
+
+        for k, s in self.sources():
+
+            columns = self.columns(k, s)
+            bars[k] = aggregate_bars(columns["x"], columns.get("y"), self.bar_reducer)
+
+        n = len(bars)
+        positions = OrderedDict((k, decimate.as_float(x)) for k, (x, top) in bars.items())
+
+        if any(p is None for p in positions.values()):
+
+            values = sorted(set(str(v) for x, top in bars.values() for v in x))
+
+            if self.group is None:
+
+                factors = values
+                data = OrderedDict((k, dict(x=[str(v) for v in x], top=top, width=np.full(len(top), .8)))
+                                   for k, (x, top) in bars.items())
+
+            else:
+
+                factors = [(v, k) for v in values for k in bars]
+                data = OrderedDict((k, dict(x=[(str(v), k) for v in x], top=top, width=np.full(len(top), .8)))
+                                   for k, (x, top) in bars.items())
+
+            return data, factors
+
+        # bars of every group share the narrowest gap between x values
+        spread = np.unique(np.concatenate(list(positions.values())))
+        step = np.diff(spread).min() if len(spread) > 1 else 1.
+        width = .8 * step / n
+
+        data = OrderedDict()
+
+        for i, (k, (x, top)) in enumerate(bars.items()):
+
+            data[k] = dict(x=positions[k] + (i - (n - 1) / 2.) * width, top=top, width=np.full(len(top), width))
+
+        return data, None
+
+    def refresh_bars(self):
+
+        data, factors = self.bar_data()
+
+        for k, columns in data.items():
+
+            self.bar_sources[k].data = columns
+
+        if factors is not None:
+
+            self.p.x_range.factors = factors
+
+    def change_bar_reducer(self, attr, old, new):
+
+        self.bar_reducer = new
+        self.refresh_bars()
+
     def plot_bar(self):
         """
         Plot bar chart
@@ -613,42 +1470,39 @@ class GraphPlot:
         :return:
         """
 
+        data, factors = self.bar_data()
+
+        # text x values need a factor range, which can only be given when the figure is made
+        x_range = FactorRange(*factors) if factors is not None else None
+        x_axis_type = "auto" if factors is not None else self.x_axis_type
+
         self.p = figure(plot_width=self.plot_width, plot_height=self.plot_height, x_axis_label=self.x_axis_label,
-                        y_axis_label=self.y_axis_label)
+                        y_axis_label=self.y_axis_label, x_axis_type=x_axis_type, x_range=x_range)
+        self.renderers = OrderedDict()
+        self.bar_sources = OrderedDict((k, ColumnDataSource(data=columns)) for k, columns in data.items())
 
         y_axis_label = TextInput(placeholder="y-axis label")
         x_axis_label = TextInput(placeholder="x-axis label")
 
-        if self.group is not None:
-
-            for g in self.source.keys():
-
-                if list(self.source.keys()).index(g) % 2 == 0:
-
-                    self.source[g].data["x"] = [x + .2*list(self.source.keys()).index(g) for x in self.source[g].data["x"]]
-
-                else:
-                    self.source[g].data["x"] = [x - .2 * list(self.source.keys()).index(g) for x in
-                                                self.source[g].data["x"]]
-
-                self.p.vbar(x="x", top="y", width=.5, fill_color="color", source=self.source[g],
-                            line_color="black")
+        for i, (k, source) in enumerate(self.bar_sources.items()):
 
-        else:
+            self.register("data", k, self.p.vbar(x="x", top="top", width="width", fill_color=self.palette[i],
+                                                 source=source, line_color="black"))
 
-            self.p.vbar(x="x", top="y", width=.5, fill_color="color", source=self.source, line_color="black")
+        reducer_select = Select(title="Bar height", options=list(BAR_REDUCERS), value=self.bar_reducer)
+        reducer_select.on_change("value", self.change_bar_reducer)
 
-        select_pal = Select(options=[c for c in pyplot.colormaps() if c != "jet"])
+        select_pal = Select(options=palette_names())
         title_text = TextInput(placeholder="Figure Title")
-        alpha_slider = Slider(start=0, end=1, value=1, step=.01, title="Transparency")
+        alpha_slider = self.slider("alpha", start=0, end=1, value=1, step=.01, title="Transparency")
 
         select_pal.on_change("value", self.change_palette_bar)
         y_axis_label.on_change("value", self.change_figure_yaxis)
         x_axis_label.on_change("value", self.change_figure_xaxis)
         title_text.on_change("value", self.change_figure_title)
-        alpha_slider.on_change("value", self.change_glyph_alpha)
+        alpha_slider.on_change("value_throttled", self.change_glyph_alpha)
 
-        app_layout = layout([[select_pal],
+        app_layout = layout([[select_pal, reducer_select],
                              [title_text],
                              [y_axis_label, self.p],
                              [Spacer(height=10, width=500), x_axis_label],
@@ -665,31 +1519,45 @@ class GraphPlot:
 
         self.p = figure(plot_width=self.plot_width, plot_height=self.plot_height, x_axis_type=self.x_axis_type,
                         x_axis_label=self.x_axis_label, y_axis_label=self.y_axis_label, title=self.plot_title)
+        self.renderers = OrderedDict()
 
-        select_pal = Select(options=[c for c in pyplot.colormaps() if c != "jet"])
-        line_thick_slider = Slider(start=1, end=10, value=1, step=1, title="Line Width")
+        select_pal = Select(options=palette_names())
+        line_thick_slider = self.slider("line_width", start=1, end=10, value=1, step=1, title="Line Width")
         title_text = TextInput(placeholder="Figure Title")
         y_axis_label = TextInput(placeholder="y-axis label")
         x_axis_label = TextInput(placeholder="x-axis label")
 
         if self.group is not None:
 
-            for k in self.source.keys():
+            for i, k in enumerate(self.source.keys()):
 
-                self.p.line("x", "y", color=self.source[k].data["color"][0], source=self.source[k])
+                self.register("data", k, self.p.line("x", "y", color=self.palette[i], source=self.source[k]))
 
-            legend = Legend(items=[*list(zip(list(self.source.keys()),
-                                             [[r] for r in self.p.renderers if isinstance(r, GlyphRenderer)]))],
-                            location=(0, -30))
+            legend = Legend(items=[(k, [r]) for k, r in self.renderers["data"].items()], location=(0, -30))
             self.p.yaxis[0].formatter.use_scientific = False
             self.p.add_layout(legend, 'left')
 
         else:
 
-            self.p.line("x", "y", color=self.source.data["color"][0], source=self.source)
+            self.register("data", None, self.p.line("x", "y", color=self.palette[0], source=self.source))
+
+        if self.x_axis_type == "datetime":
+
+            # long time series are drawn from resampled levels, the band shows the range of each bucket
+            for i, (k, s) in enumerate(self.sources()):
+
+                self.envelope_sources[k] = ColumnDataSource(data=dict(x=[], lower=[], upper=[]))
+                self.register("envelope", k, self.p.varea(x="x", y1="lower", y2="upper", fill_color=self.palette[i],
+                                                          fill_alpha=.2, source=self.envelope_sources[k]))
+
+            self.add_level_of_detail("resample")
+
+        else:
+
+            self.add_level_of_detail("line")
 
         select_pal.on_change("value", self.change_palette_lines)
-        line_thick_slider.on_change("value", self.change_line_thick)
+        line_thick_slider.on_change("value_throttled", self.change_line_thick)
         title_text.on_change("value", self.change_figure_title)
         y_axis_label.on_change("value", self.change_figure_yaxis)
         x_axis_label.on_change("value", self.change_figure_xaxis)
@@ -705,50 +1573,33 @@ class GraphPlot:
 
         self.p = figure(plot_width=self.plot_width, plot_height=self.plot_height, x_axis_type=self.x_axis_type,
                         x_axis_label=self.x_axis_label, y_axis_label=self.y_axis_label, title=self.plot_title)
+        self.renderers = OrderedDict()
 
-        if self.group is not None:
-
-            for k in self.source.keys():
-
-                cuts = pd.Series(pd.cut(self.source[k].data["x"], bins)).str.replace("\(|\]", "").str.split(", ", expand=True).astype(float)
-
-                cuts = cuts.groupby([0, 1], as_index=False).size().reset_index(name="freq")
-
-                self.hist_source = ColumnDataSource(data=dict(min=cuts[0].tolist(), max=cuts[1].tolist(),
-                                                         freq=cuts["freq"].tolist(),
-                                                         color=[self.source[k].data["color"][0], ] * len(cuts.index)))
-
-                self.p.quad(left="min", right="max", bottom=0, top="freq", source=self.hist_source, line_color="black",
-                            color="color")
-
-        else:
-
-            cuts = pd.cut(self.source.data["x"], bins).str.replace("\(|\]", "").str.split(", ", expand=True).astype(float)
+        self.bins = bins
 
-            cuts = cuts.groupby([0, 1], as_index=False).size().reset_index(name="freq")
+        for i, (k, s) in enumerate(self.sources()):
 
-            self.hist_source = ColumnDataSource(data=dict(min=cuts[0].tolist(), max=cuts[1].tolist(),
-                                                     freq=cuts["freq"].tolist(),
-                                                     color=[self.source.data["color"][0], ] * len(cuts.index)))
+            self.hist_source = ColumnDataSource(data=self.histogram_data(k, s, bins))
+            self.hist_sources[k] = self.hist_source
 
-            self.p.quad(left="min", right="max", bottom=0, top="freq", source=self.hist_source, line_color="black",
-                        color="color")
+            self.register("hist", k, self.p.quad(left="min", right="max", bottom=0, top="freq", source=self.hist_source,
+                                                 line_color="black", color=self.palette[i]))
 
-        select_pal = Select(options=[c for c in pyplot.colormaps() if c != "jet"])
-        alpha_slider = Slider(start=0, end=1, value=1, step=.01, title="Transparency")
+        select_pal = Select(options=palette_names())
+        alpha_slider = self.slider("alpha", start=0, end=1, value=1, step=.01, title="Transparency")
         title_text = TextInput(placeholder="Figure Title")
-        bins_slider = Slider(start=1, end=99, value=bins, step=1, title="Bins")
+        bins_slider = self.slider("bins", start=1, end=99, value=bins, step=1, title="Bins")
         line_check = CheckboxGroup(labels=["Outline"], active=[0])
         y_axis_label = TextInput(placeholder="y-axis label")
         x_axis_label = TextInput(placeholder="x-axis label")
 
         select_pal.on_change("value", self.change_palette_hist)
-        alpha_slider.on_change("value", self.change_glyph_alpha)
+        alpha_slider.on_change("value_throttled", self.change_glyph_alpha)
         title_text.on_change("value", self.change_figure_title)
         y_axis_label.on_change("value", self.change_figure_yaxis)
         x_axis_label.on_change("value", self.change_figure_xaxis)
         line_check.on_change("active", self.change_hist_line)
-        bins_slider.on_change("value", self.change_bins)
+        bins_slider.on_change("value_throttled", self.change_bins)
 
         app_layout = layout([title_text],
                             [select_pal],
@@ -0,0 +1,326 @@
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_categorical_dtype, union_categoricals
+
+
+# uploads bigger than this are spooled to disk while they are parsed
+SPOOL_SIZE = 64 * 1024 * 1024
+
+# rows read from the top of an upload to fill the preview and work out the column types
+SAMPLE_ROWS = 1000
+
+
+def sniff(buffer, rows=SAMPLE_ROWS, encoding="latin-1"):
+    """
+    Reads the header and the first rows of a csv, the buffer is left at the start
+
+    :param buffer: binary file like object holding the csv
+    :param rows: number of rows to read
+    :param encoding: text encoding of the file
+    :return: dataframe of the sample
+    """
+
+    buffer.seek(0)
+    sample = pd.read_csv(buffer, nrows=rows, encoding=encoding)
+    buffer.seek(0)
+
+    return sample
+
+
+def infer_kinds(sample):
+    """
+    Works out how each column should be parsed from a sample of it
+
+    :param sample: dataframe
+    :return: dict of column name to "numeric", "datetime" or "text"
+    """
+
+    kinds = OrderedDict()
+
+    for col in sample.columns:
+
+        values = sample[col].dropna()
+
+        if sample[col].dtype.kind in "biuf":
+
+            kinds[col] = "numeric"
+
+        elif len(values) and is_datetime_text(values):
+
+            kinds[col] = "datetime"
+
+        else:
+
+            kinds[col] = "text"
+
+    return kinds
+
+
+def is_datetime_text(values):
+
+    try:
+        with warnings.catch_warnings():
+
+            warnings.simplefilter("ignore")
+
+            return bool(pd.to_datetime(values, errors="coerce").notna().all())
+
+    except (ValueError, TypeError, OverflowError):
+
+        return False
+
+
+def read_options(kinds, columns):
+    """
+    read_csv options that parse only some columns of a file, each according to its kind. Dates are parsed and text is
+    stored as category codes, whatever the column is used for.
+
+    :param kinds: column kinds from infer_kinds
+    :param columns: columns to parse
+    :return: dict of read_csv keyword arguments
+    """
+
+    return dict(usecols=list(columns),
+                dtype={c: "category" for c in columns if kinds.get(c) == "text"},
+                parse_dates=[c for c in columns if kinds.get(c) == "datetime"])
+
+
+def compact(values):
+    """
+    Downcasts a numeric column to the smallest type that holds all of its values exactly
+
+    :param values: series
+    :return: series
+    """
+
+    if values.dtype.kind == "i":
+
+        return pd.to_numeric(values, downcast="integer")
+
+    if values.dtype.kind == "f" and values.dtype.itemsize > 4:
+
+        small = values.astype(np.float32)
+        same = (small.values == values.values) | (np.isnan(small.values) & np.isnan(values.values))
+
+        if same.all():
+
+            return small
+
+    return values
+
+
+class ColumnStore:
+    """
+    Collects the chunks of a csv column by column so a full copy of the frame only exists once it is asked for
+    """
+
+    def __init__(self):
+
+        self.columns = OrderedDict()
+        self.rows = 0
+
+    def append(self, chunk):
+        """
+        Adds a parsed chunk to the store
+
+        :param chunk: dataframe
+        :return: None
+        """
+
+        for col in chunk.columns:
+
+            self.columns.setdefault(col, []).append(chunk[col])
+
+        self.rows += len(chunk.index)
+
+    def to_frame(self):
+        """
+        Joins the chunks into one dataframe, one column at a time, with numeric columns downcast
+
+        :return: dataframe
+        """
+
+        frame = OrderedDict()
+
+        while self.columns:
+
+            col, parts = self.columns.popitem(last=False)
+
+            if len(parts) == 1:
+
+                values = parts[0].reset_index(drop=True)
+
+            elif is_categorical_dtype(parts[0].dtype):
+
+                # chunks have their own categories, concat would turn them back into text
+                values = pd.Series(union_categoricals([p.values for p in parts]), name=col)
+
+            else:
+
+                values = pd.concat(parts, ignore_index=True)
+
+            frame[col] = compact(values)
+
+        return pd.DataFrame(frame)
+
+
+class ChunkedCSV:
+    """
+    Parses a binary csv buffer in chunks, keeping track of how much of it has been read
+    """
+
+    def __init__(self, buffer, chunksize=100000, encoding="latin-1", **options):
+        """
+        :param buffer: binary file like object holding the csv
+        :param chunksize: rows parsed per chunk
+        :param encoding: text encoding of the file
+        :param options: other read_csv options, like those from read_options
+        """
+
+        self.buffer = buffer
+
+        self.buffer.seek(0, 2)
+        self.size = self.buffer.tell()
+        self.buffer.seek(0)
+
+        self.reader = pd.read_csv(self.buffer, chunksize=chunksize, encoding=encoding, **options)
+        self.store = ColumnStore()
+        self.done = False
+
+    def progress(self):
+        """
+        :return: fraction of the buffer that has been parsed
+        """
+
+        if self.done or not self.size:
+
+            return 1.0
+
+        return min(self.buffer.tell() / self.size, 1.0)
+
+    def read_chunk(self):
+        """
+        Parses the next chunk into the store
+
+        :return: the chunk or None when the file is exhausted
+        """
+
+        try:
+            chunk = next(self.reader)
+
+        except StopIteration:
+
+            self.close()
+
+            return None
+
+        self.store.append(chunk)
+
+        return chunk
+
+    def close(self):
+
+        self.done = True
+        self.reader.close()
+        self.buffer.close()
+
+
+class ColumnSummary:
+    """
+    Summary statistics of every column of a csv, gathered a chunk at a time so the file is only read once
+    """
+
+    def __init__(self):
+
+        self.columns = None
+        self.count = None
+        self.nulls = None
+        self.min = None
+        self.max = None
+        self.sum = None
+
+    def add(self, chunk):
+        """
+        Adds the statistics of a chunk, every column is reduced at once rather than one at a time
+
+        :param chunk: dataframe
+        :return: None
+        """
+
+        numeric = chunk.select_dtypes(include=[np.number])
+
+        stats = (chunk.count(), chunk.isnull().sum(), numeric.min(), numeric.max(), numeric.sum())
+
+        if self.columns is None:
+
+            self.columns = chunk.columns
+            self.count, self.nulls, self.min, self.max, self.sum = stats
+
+            return
+
+        self.count = self.count.add(stats[0], fill_value=0)
+        self.nulls = self.nulls.add(stats[1], fill_value=0)
+        self.min = pd.concat([self.min, stats[2]], axis=1).min(axis=1)
+        self.max = pd.concat([self.max, stats[3]], axis=1).max(axis=1)
+        self.sum = self.sum.add(stats[4], fill_value=0)
+
+    def to_frame(self):
+        """
+        :return: dataframe with a row per column
+        """
+
+        if self.columns is None:
+
+            return pd.DataFrame(columns=["column", "count", "nulls", "min", "max", "mean"])
+
+        frame = pd.DataFrame({"column": self.columns}, index=self.columns)
+
+        frame["count"] = self.count
+        frame["nulls"] = self.nulls
+        frame["min"] = self.min
+        frame["max"] = self.max
+        frame["mean"] = self.sum / self.count
+
+        return frame.reset_index(drop=True)
+
+
+def scan(path, sample_size=1000, chunksize=100000, encoding="latin-1", seed=None):
+    """
+    Reads a whole csv once, taking a uniform random sample of its rows and summarising its columns. The sample is a
+    reservoir of the rows with the smallest random keys, so any number of chunks can be fed through it.
+
+    :param path: csv file
+    :param sample_size: rows to sample
+    :param chunksize: rows parsed per chunk
+    :param encoding: text encoding of the file
+    :param seed: random seed
+    :return: sample dataframe in file order and summary dataframe
+    """
+
+    rng = np.random.RandomState(seed)
+    summary = ColumnSummary()
+
+    sample = None
+    keys = np.array([])
+
+    for chunk in pd.read_csv(path, chunksize=chunksize, encoding=encoding):
+
+        summary.add(chunk)
+
+        sample = chunk if sample is None else pd.concat([sample, chunk])
+        keys = np.concatenate([keys, rng.random_sample(len(chunk.index))])
+
+        if len(keys) > sample_size:
+
+            keep = np.argpartition(keys, sample_size)[:sample_size]
+            sample = sample.iloc[keep]
+            keys = keys[keep]
+
+    if sample is None:
+
+        return pd.DataFrame(), summary.to_frame()
+
+    return sample.sort_index(), summary.to_frame()
@@ -16,11 +16,17 @@ imp_data.x_drop = Dropdown(label="x-axis Variable")
 imp_data.y_drop = Dropdown(label="y-axis Variable")
 imp_data.g_drop = Dropdown(label="Group Variable")
 imp_data.dt = DataTable()
-imp_data.plot_type = RadioButtonGroup(labels=["Line", "Bar", "Scatter", "Histogram"])
+imp_data.prev_page = Button(label="Previous")
+imp_data.next_page = Button(label="Next")
+imp_data.page_label = PreText(text="")
+imp_data.sample_button = Button(label="Sample whole file")
+imp_data.summary = DataTable()
+imp_data.plot_type = RadioButtonGroup(labels=["Line", "Bar", "Scatter", "Histogram", "Density"])
 imp_data.plot_label = PreText(text="Plot type")
 imp_data.submit = Button(label="Submit", button_type="success")
+imp_data.status = PreText(text="")
 
-app_layout = layout([button])
+app_layout = layout([button, imp_data.status])
 doc = curdoc()
 
 imp_data.layout = app_layout
@@ -0,0 +1,97 @@
+import seaborn
+from collections import OrderedDict
+from threading import Lock
+from matplotlib import pyplot
+
+
+class PaletteRegistry:
+    """
+    Process wide cache of seaborn palettes keyed by (palette name, number of colors). Palettes are built on first use
+    and the least recently used ones are evicted once the registry is full.
+    """
+
+    def __init__(self, max_size=256):
+        """
+        :param max_size: maximum number of palettes to keep
+        """
+
+        self.max_size = max_size
+        self.palettes = OrderedDict()
+        self.lock = Lock()
+        self.names = None
+
+    def palette_names(self):
+        """
+        Names of the palettes that can be selected
+
+        :return: list of colormap names
+        """
+
+        if self.names is None:
+
+            self.names = [n for n in pyplot.colormaps() if n != "jet"]
+
+        return self.names
+
+    def get(self, name, n_colors):
+        """
+        Get the hex codes of a palette, building it if it is not cached yet
+
+        :param name: palette name
+        :param n_colors: number of colors to assign
+        :return: list of hex codes
+        """
+
+        key = (name, n_colors)
+
+        with self.lock:
+
+            if key in self.palettes:
+
+                self.palettes.move_to_end(key)
+
+                return self.palettes[key]
+
+        palette = seaborn.color_palette(name, n_colors).as_hex()
+
+        with self.lock:
+
+            self.palettes[key] = palette
+            self.palettes.move_to_end(key)
+
+            while len(self.palettes) > self.max_size:
+
+                self.palettes.popitem(last=False)
+
+        return palette
+
+    def clear(self):
+
+        with self.lock:
+
+            self.palettes.clear()
+
+
+registry = PaletteRegistry()
+
+
+def get_palette(name, n_colors):
+    """
+    Get the hex codes of a palette from the process wide registry
+
+    :param name: palette name
+    :param n_colors: number of colors to assign
+    :return: list of hex codes
+    """
+
+    return registry.get(name, n_colors)
+
+
+def palette_names():
+    """
+    Names of the palettes that can be selected
+
+    :return: list of colormap names
+    """
+
+    return registry.palette_names()
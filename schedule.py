@@ -0,0 +1,49 @@
+class CoalescedCallback:
+    """
+    Wraps an on_change callback so bursts of changes, like dragging a slider, only run it once per interval with the
+    latest value. The first change starts the interval and any changes that come in before it is up replace the value
+    that will be used.
+    """
+
+    def __init__(self, callback, delay, model):
+        """
+        :param callback: on_change callback to run
+        :param delay: milliseconds to gather changes for, 0 runs the callback straight away
+        :param model: model the callback is attached to, its document runs the delayed calls
+        """
+
+        self.callback = callback
+        self.delay = delay
+        self.model = model
+        self.pending = None
+
+    def __call__(self, attr, old, new):
+
+        doc = self.model.document
+
+        if not self.delay or doc is None:
+
+            self.callback(attr, old, new)
+
+            return
+
+        if self.pending is not None:
+
+            # latest wins, the old value stays the one from before the burst
+            self.pending = (attr, self.pending[1], new)
+
+            return
+
+        self.pending = (attr, old, new)
+        doc.add_timeout_callback(self.flush, self.delay)
+
+    def flush(self):
+
+        if self.pending is None:
+
+            return
+
+        attr, old, new = self.pending
+        self.pending = None
+
+        self.callback(attr, old, new)
@@ -1,16 +1,335 @@
-import statsmodels.api as sm
-from statsmodels.sandbox.regression.predstd import wls_prediction_std
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_categorical_dtype
 
+import decimate
 
+try:
+    import statsmodels.api as sm
+    from statsmodels.sandbox.regression.predstd import wls_prediction_std
 
-def get_regression_line(X, y):
+except ImportError:
+    sm = None
 
-    # X = X.as_matrix()
-    # y = y.as_matrix()
+try:
+    from scipy.special import stdtrit
 
-    X_cons = sm.add_constant(X)
-    lm = sm.OLS(y, X_cons).fit()
+except ImportError:
+    stdtrit = None
 
-    pred, upper, lower = wls_prediction_std(lm)
 
-    return X, lm.fittedvalues, upper, lower
\ No newline at end of file
+# quantiles kept in the summary of every column
+QUANTILES = (0, .01, .25, .5, .75, .99, 1)
+
+# 97.5% quantile of the standard normal, used when scipy isn't around
+Z_975 = 1.959963984540054
+
+# 97.5% quantile of Student's t for 1 to 10 degrees of freedom, where the expansion used without scipy is too far off
+# (11% at 1 degree of freedom). From 11 on it is within 3 parts in a million.
+T_975 = np.array([12.706204736432095, 4.302652729911275, 3.182446305284263, 2.7764451051977987, 2.5705818366147395,
+                  2.4469118487916806, 2.3646242510102993, 2.3060041350333704, 2.2621571627409915, 2.2281388519649385])
+
+
+def t_quantile_975(df):
+    """
+    97.5% quantile of Student's t distribution, the multiplier of a 95% prediction interval
+
+    :param df: degrees of freedom
+    :return: quantile
+    """
+
+    df = np.asarray(df, dtype="float64")
+
+    if stdtrit is not None:
+
+        return stdtrit(df, .975)
+
+    # Cornish-Fisher expansion around the normal quantile
+    z = Z_975
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+
+        quantile = (z + (z ** 3 + z) / (4 * df) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+                    + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * df ** 3)
+                    + (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * df ** 4))
+
+    # degrees of freedom come from row counts, the small ones are looked up
+    low = (df >= 1) & (df <= len(T_975)) & (df == np.round(df))
+
+    return np.where(low, T_975[np.clip(np.round(df), 1, len(T_975)).astype(int) - 1], quantile)
+
+
+class LinearFit:
+    """
+    Least squares fits of y on a single x for one or more groups, worked out from running sums (n, sum x, sum y,
+    sum xy, sum x^2, sum y^2). The values are shifted by the first values seen so the sums keep their precision. Rows
+    can be added and taken away as data streams in and rolls over without fitting again.
+    """
+
+    def __init__(self, groups=1):
+        """
+        :param groups: number of groups to fit
+        """
+
+        self.groups = groups
+        self.n = np.zeros(groups)
+        self.sx = np.zeros(groups)
+        self.sy = np.zeros(groups)
+        self.sxy = np.zeros(groups)
+        self.sxx = np.zeros(groups)
+        self.syy = np.zeros(groups)
+
+        # range of x seen by each group, used to decide where to draw the line
+        self.x_min = np.full(groups, np.inf)
+        self.x_max = np.full(groups, -np.inf)
+
+        self.x0 = None
+        self.y0 = None
+
+    def add(self, x, y, codes=0):
+        """
+        Adds values to the sums, rows with a missing x or y are skipped
+
+        :param x: x values
+        :param y: y values
+        :param codes: group number of every value, or one group number for all of them
+        :return: self
+        """
+
+        return self.accumulate(x, y, codes, 1)
+
+    def remove(self, x, y, codes=0):
+        """
+        Takes values that were added before back out of the sums. The x range is left as it is.
+
+        :param x: x values
+        :param y: y values
+        :param codes: group number of every value, or one group number for all of them
+        :return: self
+        """
+
+        return self.accumulate(x, y, codes, -1)
+
+    def accumulate(self, x, y, codes, sign):
+
+        x = np.asarray(x, dtype="float64")
+        y = np.asarray(y, dtype="float64")
+
+        finite = np.isfinite(x) & np.isfinite(y)
+
+        if not finite.all():
+
+            x = x[finite]
+            y = y[finite]
+
+            if np.ndim(codes):
+
+                codes = np.asarray(codes)[finite]
+
+        if self.x0 is None:
+
+            self.x0 = x[0] if len(x) else 0.
+            self.y0 = y[0] if len(y) else 0.
+
+        dx = x - self.x0
+        dy = y - self.y0
+
+        if np.ndim(codes):
+
+            sums = np.array([np.bincount(codes, weights=w, minlength=self.groups)
+                             for w in (None, dx, dy, dx * dy, dx * dx, dy * dy)])
+
+            if sign > 0:
+
+                np.minimum.at(self.x_min, codes, x)
+                np.maximum.at(self.x_max, codes, x)
+
+        else:
+
+            sums = np.zeros((6, self.groups))
+            sums[:, codes] = [len(dx), dx.sum(), dy.sum(), dx.dot(dy), dx.dot(dx), dy.dot(dy)]
+
+            if sign > 0 and len(x):
+
+                self.x_min[codes] = min(self.x_min[codes], x.min())
+                self.x_max[codes] = max(self.x_max[codes], x.max())
+
+        sums *= sign
+
+        self.n += sums[0]
+        self.sx += sums[1]
+        self.sy += sums[2]
+        self.sxy += sums[3]
+        self.sxx += sums[4]
+        self.syy += sums[5]
+
+        return self
+
+    def coefficients(self):
+        """
+        :return: intercept, slope, mean squared error and centered sum of squares of x of every group, in shifted units
+        """
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+
+            mean_x = self.sx / self.n
+            mean_y = self.sy / self.n
+
+            ssx = self.sxx - self.n * mean_x ** 2
+            sxy = self.sxy - self.n * mean_x * mean_y
+            ssy = self.syy - self.n * mean_y ** 2
+
+            slope = sxy / ssx
+            intercept = mean_y - slope * mean_x
+            mse = np.maximum(ssy - slope * sxy, 0) / (self.n - 2)
+
+        return intercept, slope, mse, ssx
+
+    def predict(self, x, group=0):
+        """
+        Fitted values and 95% prediction interval, same as statsmodels' OLS with wls_prediction_std
+
+        :param x: x values to predict at
+        :param group: group number
+        :return: fitted values, lower bound, upper bound
+        """
+
+        intercept, slope, mse, ssx = [c[group] for c in self.coefficients()]
+        n = self.n[group]
+
+        dx = np.asarray(x, dtype="float64") - self.x0
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+
+            fitted = self.y0 + intercept + slope * dx
+            spread = t_quantile_975(n - 2) * np.sqrt(mse * (1 + 1 / n + (dx - self.sx[group] / n) ** 2 / ssx))
+
+        return fitted, fitted - spread, fitted + spread
+
+
+def get_regression_line(X, y, engine="numpy"):
+    """
+    Fits a simple linear regression
+
+    :param X: x values
+    :param y: y values
+    :param engine: "numpy" for the closed form fit or "statsmodels"
+    :return: x values, fitted values, lower and upper bounds of the 95% prediction interval
+    """
+
+    if engine == "statsmodels":
+
+        if sm is None:
+
+            raise ImportError("statsmodels is needed for the statsmodels regression engine")
+
+        X_cons = sm.add_constant(X)
+        lm = sm.OLS(y, X_cons).fit()
+
+        predstd, lower, upper = wls_prediction_std(lm)
+
+        return X, lm.fittedvalues, lower, upper
+
+    fitted, lower, upper = LinearFit().add(X, y).predict(X)
+
+    return X, fitted, lower, upper
+
+
+class HistogramIndex:
+    """
+    Sorted copy of a column that can be binned at any bin count without scanning the data again. Each bin count only
+    needs a binary search per edge.
+    """
+
+    def __init__(self, values, value_range=None):
+        """
+        :param values: float array, non finite values are dropped
+        :param value_range: (min, max) to bin over if it is already known, otherwise the range of the values
+        """
+
+        values = np.asarray(values, dtype="float64")
+
+        self.values = np.sort(values[np.isfinite(values)])
+
+        if value_range is not None:
+
+            self.min, self.max = value_range
+
+        elif len(self.values):
+
+            self.min = self.values[0]
+            self.max = self.values[-1]
+
+        else:
+
+            self.min, self.max = 0., 1.
+
+        # same as numpy, a column with a single value gets a unit wide range
+        if self.min == self.max:
+
+            self.min -= .5
+            self.max += .5
+
+    def histogram(self, bins):
+        """
+        Counts the values into equal width bins. Empty bins are kept.
+
+        :param bins: number of bins
+        :return: left edges, right edges and counts
+        """
+
+        edges = np.linspace(self.min, self.max, bins + 1)
+
+        positions = np.searchsorted(self.values, edges, side="left")
+
+        # the last bin includes its right edge
+        positions[-1] = len(self.values)
+
+        return edges[:-1], edges[1:], np.diff(positions)
+
+
+def column_stats(values):
+    """
+    Summary of a column worked out once when it is parsed. Numbers and dates get their range and quantiles, with
+    dates in milliseconds since epoch like bokeh uses. Every column gets its count and number of distinct values,
+    which is the group count when it is used to group.
+
+    :param values: series
+    :return: dict of count, nulls, distinct, min, max and quantiles, the last three are None for text
+    """
+
+    summary = dict(count=0, nulls=0, distinct=0, min=None, max=None, quantiles=None)
+
+    if is_categorical_dtype(values.dtype):
+
+        codes = np.asarray(values.cat.codes)
+        codes = codes[codes >= 0]
+
+        summary.update(count=len(codes), distinct=int(np.count_nonzero(np.bincount(codes))) if len(codes) else 0)
+
+    else:
+
+        floats = decimate.as_float(values)
+
+        if floats is None:
+
+            present = values.dropna()
+
+            summary.update(count=len(present), distinct=int(present.nunique()))
+
+        else:
+
+            floats = floats[np.isfinite(floats)]
+
+            summary.update(count=len(floats), distinct=int(pd.unique(floats).size))
+
+            if len(floats):
+
+                quantiles = np.percentile(floats, [q * 100 for q in QUANTILES])
+
+                summary.update(min=float(floats.min()), max=float(floats.max()),
+                               quantiles=[float(q) for q in quantiles])
+
+    summary["nulls"] = len(values) - summary["count"]
+
+    return summary
@@ -0,0 +1,251 @@
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+import ingest
+import stats
+
+
+# where ingested datasets are kept, one folder per content hash
+STORE_DIR = os.environ.get("AUTOVIS_STORE", os.path.join(os.path.expanduser("~"), ".autovis", "datasets"))
+
+MANIFEST = "manifest.json"
+
+SOURCE = "source.csv"
+
+# text encoding uploads are read with
+ENCODING = "latin-1"
+
+
+class StoredDataset:
+    """
+    Dataset saved as the uploaded csv plus one memory mapped .npy file for each column that has been parsed. Opening
+    it only reads the manifest, a column's pages are read from disk when its values are used and the page cache is
+    shared by every process that has it open. Text columns are kept as category codes.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: folder the dataset was saved to
+        """
+
+        self.path = path
+        self.key = os.path.basename(path)
+        self.source = os.path.join(path, SOURCE)
+
+        with open(os.path.join(path, MANIFEST)) as f:
+
+            self.manifest = json.load(f)
+
+        self.columns = pd.Index(self.manifest["columns"])
+        self.kinds = self.manifest["kinds"]
+        self.files = {c: "{}".format(i) for i, c in enumerate(self.columns)}
+        self.series = {}
+        self.specs = {}
+
+    @property
+    def rows(self):
+        """
+        :return: number of rows or None if no column has been parsed yet
+        """
+
+        for name in self.columns:
+
+            spec = self.spec(name)
+
+            if spec is not None:
+
+                return spec["rows"]
+
+        return None
+
+    def spec(self, name):
+
+        # a column doesn't change once it has been saved, so its spec is only read once
+        if name not in self.specs:
+
+            try:
+                with open(os.path.join(self.path, self.files[name] + ".json")) as f:
+
+                    self.specs[name] = json.load(f)
+
+            except (IOError, OSError):
+
+                return None
+
+        return self.specs[name]
+
+    def stats(self, name):
+        """
+        :param name: column name
+        :return: summary worked out when the column was parsed, see stats.column_stats, or None
+        """
+
+        spec = self.spec(name)
+
+        return None if spec is None else spec.get("stats")
+
+    def has(self, name):
+        """
+        :param name: column name
+        :return: whether the column has been parsed
+        """
+
+        return name in self.specs or os.path.exists(os.path.join(self.path, self.files[name] + ".json"))
+
+    def __getitem__(self, name):
+        """
+        :param name: column name
+        :return: series backed by the memory mapped column
+        """
+
+        if name not in self.series:
+
+            spec = self.spec(name)
+
+            if spec is None:
+
+                raise KeyError("Column {} hasn't been parsed".format(name))
+
+            values = np.load(os.path.join(self.path, self.files[name] + ".npy"), mmap_mode="r")
+
+            if spec["kind"] == "category":
+
+                values = pd.Categorical.from_codes(values, spec["categories"])
+
+            self.series[name] = pd.Series(values, name=name, copy=False)
+
+        return self.series[name]
+
+    def head(self, n=5):
+        """
+        :param n: number of rows
+        :return: dataframe of the first rows of the csv
+        """
+
+        return self.page(0, n)
+
+    def page(self, start, n):
+        """
+        Reads a window of rows straight from the csv, the rows before it are skipped without being parsed
+
+        :param start: first row
+        :param n: number of rows
+        :return: dataframe of the rows, indexed by row number
+        """
+
+        rows = pd.read_csv(self.source, skiprows=range(1, start + 1), nrows=n, encoding=ENCODING)
+        rows.index += start
+
+        return rows
+
+    def add(self, frame):
+        """
+        Saves parsed columns. Each column is written under a temporary name and renamed into place once complete, so
+        a half written column is never opened and sessions parsing the same column at once don't get in each
+        other's way.
+
+        :param frame: dataframe of some of the columns
+        :return: None
+        """
+
+        suffix = ".tmp-{}-{}".format(os.getpid(), threading.get_ident())
+
+        for name in frame.columns:
+
+            series = frame[name]
+            base = os.path.join(self.path, self.files[name])
+            spec = {"rows": len(series), "stats": stats.column_stats(series)}
+
+            if series.dtype.kind in "biufcmM":
+
+                spec["kind"] = "values"
+                values = series.values
+
+            else:
+
+                spec["kind"] = "category"
+                categorical = series.astype("category").cat
+                spec["categories"] = categorical.categories.tolist()
+                values = categorical.codes.values
+
+            # np.save adds .npy to names that don't end in it
+            np.save(base + suffix + ".npy", values)
+            os.replace(base + suffix + ".npy", base + ".npy")
+
+            with open(base + suffix, "w") as f:
+
+                json.dump(spec, f, default=str)
+
+            # the spec goes in last, it marks the column as there
+            os.replace(base + suffix, base + ".json")
+
+
+def dataset_path(key):
+
+    return os.path.join(STORE_DIR, key)
+
+
+def create(key, buffer):
+    """
+    Adds an upload to the store. The csv is copied in and its header and column types are worked out from a sample,
+    columns are only parsed once they are used. The folder is filled under a temporary name and renamed into place so
+    a half written dataset is never opened.
+
+    :param key: content hash of the file
+    :param buffer: binary file like object holding the csv
+    :return: StoredDataset
+    """
+
+    path = dataset_path(key)
+
+    if os.path.exists(os.path.join(path, MANIFEST)):
+
+        return StoredDataset(path)
+
+    kinds = ingest.infer_kinds(ingest.sniff(buffer, encoding=ENCODING))
+
+    tmp = "{}.tmp-{}-{}".format(path, os.getpid(), threading.get_ident())
+
+    os.makedirs(tmp, exist_ok=True)
+
+    buffer.seek(0)
+
+    with open(os.path.join(tmp, SOURCE), "wb") as f:
+
+        shutil.copyfileobj(buffer, f)
+
+    with open(os.path.join(tmp, MANIFEST), "w") as f:
+
+        json.dump({"columns": [str(c) for c in kinds], "kinds": {str(c): k for c, k in kinds.items()}}, f)
+
+    try:
+        os.rename(tmp, path)
+
+    except OSError:
+
+        # another process saved it first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    return StoredDataset(path)
+
+
+def load(key):
+    """
+    Opens a dataset from the store
+
+    :param key: content hash
+    :return: StoredDataset or None if it hasn't been saved
+    """
+
+    path = dataset_path(key)
+
+    if not os.path.exists(os.path.join(path, MANIFEST)):
+
+        return None
+
+    return StoredDataset(path)
@@ -0,0 +1,47 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+import batch
+import charts
+import storage
+
+
+def test_render_writes_only_the_figure(tmp_path, monkeypatch, caplog):
+
+    monkeypatch.setattr(storage, "STORE_DIR", str(tmp_path / "store"))
+
+    rng = np.random.RandomState(0)
+    csv = tmp_path / "data.csv"
+    frame = pd.DataFrame({"x": rng.rand(20000), "y": rng.rand(20000), "g": rng.choice(list("ab"), 20000)})
+    frame.to_csv(str(csv), index=False)
+
+    spec = charts.ChartSpec(None, "x", None, "g", "Histogram", bins=12, title="Spread")
+    points = charts.ChartSpec(None, "x", "y", "g", "Scatter")
+    stored = batch.prepare(str(csv), [spec, points])
+
+    name, error = batch.render(stored.path, "spread", spec._replace(dataset=stored.key), str(tmp_path), ["json"])
+
+    assert error is None
+
+    with open(str(tmp_path / "spread.json")) as f:
+
+        references = json.load(f)["roots"]["references"]
+
+    types = set(r["type"] for r in references)
+
+    assert "Plot" in types
+    assert not types & {"Slider", "Select", "TextInput", "CheckboxGroup"}
+    assert [r["attributes"]["text"] for r in references if r["type"] == "Title"] == ["Spread"]
+
+    bins = [r["attributes"]["data"]["freq"] for r in references
+            if r["type"] == "ColumnDataSource" and "freq" in r["attributes"]["data"]]
+
+    assert [len(b) if isinstance(b, list) else b["shape"][0] for b in bins] == [12, 12]
+
+    # a decimated scatter doesn't listen to its ranges in standalone output, so bokeh has nothing to warn about
+    result = batch.render(stored.path, "points", points._replace(dataset=stored.key), str(tmp_path), ["html"])
+
+    assert result == ("points", None)
+    assert not [r for r in caplog.records if r.name.startswith("bokeh")]
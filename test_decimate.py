@@ -0,0 +1,104 @@
+import numpy as np
+
+import decimate
+
+
+def assert_same_levels(ladder, rows_x, rows_y):
+
+    rebuilt = decimate.ResampleLadder(rows_x, rows_y)
+
+    for width in ladder.levels:
+
+        expected = rebuilt.level(width)
+
+        for c, values in ladder.level(width).items():
+
+            np.testing.assert_allclose(values, expected[c], err_msg="{} {}".format(width, c))
+
+
+def test_column_buffer_matches_array():
+
+    rng = np.random.RandomState(0)
+    buffer = decimate.ColumnBuffer(np.arange(10))
+    expected = np.arange(10)
+    handed_out = []
+
+    for step in range(200):
+
+        new = rng.rand(rng.randint(0, 50))
+        dropped = rng.randint(0, 40)
+
+        buffer.drop(dropped)
+        buffer.append(new)
+        expected = np.concatenate([expected[dropped:], new])
+
+        np.testing.assert_array_equal(buffer.values, expected)
+
+        handed_out.append((buffer.values, buffer.values.copy()))
+
+    # dropping and appending never write over what was handed out
+    for values, copy in handed_out:
+
+        np.testing.assert_array_equal(values, copy)
+
+
+def test_column_buffer_replace():
+
+    buffer = decimate.ColumnBuffer(np.arange(10.))
+
+    buffer.replace(8, 10, [80., 90., 100.])
+    buffer.replace(0, 3, [-1.])
+    buffer.replace(2, 4, [])
+
+    np.testing.assert_array_equal(buffer.values, [-1., 3., 6., 7., 80., 90., 100.])
+
+
+def test_ladder_matches_rebuild():
+
+    rng = np.random.RandomState(1)
+    rows_x = np.cumsum(rng.exponential(700, 5000))
+    rows_y = rng.randn(5000)
+    rows_y[::97] = np.nan
+
+    ladder = decimate.ResampleLadder(rows_x, rows_y)
+
+    for width in ladder.levels:
+
+        ladder.level(width)
+
+    # rows streamed in time order with the oldest rolling off
+    for step in range(20):
+
+        new_x = rows_x[-1] + np.cumsum(rng.exponential(700, 300))
+        new_y = rng.randn(300)
+
+        ladder.drop(int((np.isfinite(rows_x[:300]) & np.isfinite(rows_y[:300])).sum()))
+        ladder.append(new_x, new_y)
+
+        rows_x = np.concatenate([rows_x[300:], new_x])
+        rows_y = np.concatenate([rows_y[300:], new_y])
+
+        assert_same_levels(ladder, rows_x, rows_y)
+
+    assert ladder.ordered
+
+    # rows from the past are merged into place
+    new_x = rng.uniform(rows_x[0], rows_x[-1], 50)
+    new_y = rng.randn(50)
+
+    ladder.append(new_x, new_y)
+
+    assert not ladder.ordered
+
+    assert_same_levels(ladder, np.concatenate([rows_x, new_x]), np.concatenate([rows_y, new_y]))
+
+
+def test_ladder_drops_everything():
+
+    ladder = decimate.ResampleLadder(np.arange(0., 5000., 100.), np.ones(50))
+    ladder.level(1e3)
+
+    ladder.drop(50)
+    ladder.append(np.array([1e4, 1.2e4]), np.array([2., 3.]))
+
+    assert_same_levels(ladder, np.array([1e4, 1.2e4]), np.array([2., 3.]))
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import graphs
+
+
+@pytest.mark.parametrize("rows", [50, 20000])
+def test_stream_longer_than_rollover(rows):
+
+    rng = np.random.RandomState(0)
+
+    # plots over the level of detail threshold keep their rows at full resolution outside the source
+    gp = graphs.GraphPlot(pd.Series(rng.rand(rows)), pd.Series(rng.rand(rows)))
+    gp.plot_scatter()
+    gp.fit_regressions()
+
+    x = rng.rand(300) + 5
+    y = rng.rand(300)
+
+    gp.stream(x, y, rollover=100)
+
+    columns = gp.columns(None, gp.source)
+    fit = gp.reg_fits[None]
+    expected = graphs.fit_line(x[-100:], y[-100:])
+
+    np.testing.assert_array_equal(columns["x"], x[-100:])
+    np.testing.assert_array_equal(columns["y"], y[-100:])
+
+    assert fit.n[0] == 100
+    assert fit.x_min[0] == x[-100:].min()
+    assert fit.x_max[0] == x[-100:].max()
+
+    for got, want in zip(fit.predict(x[:5]), expected.predict(x[:5])):
+
+        np.testing.assert_allclose(got, want)
+
+
+def test_stream_rollover_keeps_fit_range():
+
+    x = np.arange(100.)
+
+    gp = graphs.GraphPlot(pd.Series(x), pd.Series(x))
+    gp.plot_scatter()
+    gp.fit_regressions()
+
+    gp.stream(np.array([50.5, 200.]), np.array([1., 2.]), rollover=100)
+
+    assert gp.reg_fits[None].x_min[0] == 2.
+    assert gp.reg_fits[None].x_max[0] == 200.
+
+
+def test_slider_throttle_from_debounce():
+
+    gp = graphs.GraphPlot(pd.Series(np.arange(10.)), pd.Series(np.arange(10.)), debounce={"bins": 300})
+    app_layout = gp.plot_histogram(7)
+
+    throttles = {s.title: s.callback_throttle for s in app_layout.select({"type": graphs.Slider})}
+
+    assert throttles == {"Bins": 300, "Transparency": graphs.DEBOUNCE["alpha"]}
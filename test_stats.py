@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+import stats
+
+
+def sample(n=200, seed=0):
+
+    rng = np.random.RandomState(seed)
+    x = rng.uniform(0, 50, n)
+
+    return x, 3 - .7 * x + rng.normal(0, 4, n)
+
+
+def test_numpy_engine_matches_statsmodels():
+
+    pytest.importorskip("statsmodels")
+
+    x, y = sample()
+
+    expected = stats.get_regression_line(x, y, engine="statsmodels")
+    result = stats.get_regression_line(x, y, engine="numpy")
+
+    for got, want in zip(result[1:], expected[1:]):
+
+        np.testing.assert_allclose(got, np.asarray(want), rtol=1e-9)
+
+
+def test_grouped_fit_matches_separate_fits():
+
+    rng = np.random.RandomState(1)
+    x, y = sample(300)
+    codes = rng.randint(0, 3, len(x))
+
+    grouped = stats.LinearFit(groups=3).add(x, y, codes)
+    at = np.linspace(0, 50, 7)
+
+    for g in range(3):
+
+        single = stats.LinearFit().add(x[codes == g], y[codes == g])
+
+        assert grouped.n[g] == single.n[0]
+        assert grouped.x_min[g] == single.x_min[0]
+        assert grouped.x_max[g] == single.x_max[0]
+
+        for got, want in zip(grouped.predict(at, group=g), single.predict(at)):
+
+            np.testing.assert_allclose(got, want, rtol=1e-9)
+
+
+def test_remove_undoes_add():
+
+    x, y = sample()
+    extra_x, extra_y = sample(50, seed=2)
+    at = np.linspace(0, 50, 7)
+
+    fit = stats.LinearFit().add(x, y)
+    expected = fit.predict(at)
+
+    fit.add(extra_x, extra_y).remove(extra_x, extra_y)
+
+    assert fit.n[0] == len(x)
+
+    for got, want in zip(fit.predict(at), expected):
+
+        np.testing.assert_allclose(got, want, rtol=1e-9)
+
+
+def test_t_quantile_without_scipy(monkeypatch):
+
+    special = pytest.importorskip("scipy.special")
+
+    df = np.arange(1, 101, dtype="float64")
+    expected = special.stdtrit(df, .975)
+
+    monkeypatch.setattr(stats, "stdtrit", None)
+
+    np.testing.assert_allclose(stats.t_quantile_975(df), expected, rtol=1e-5)
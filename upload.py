@@ -0,0 +1,184 @@
+import hashlib
+import tempfile
+
+import numpy as np
+from bokeh.models import ColumnDataSource, CustomJS
+
+from ingest import SPOOL_SIZE
+
+
+# size of the slices the browser sends the file in
+CHUNK_SIZE = 1024 * 1024
+
+# milliseconds the browser waits for an acknowledgement before sending a chunk again
+RETRY_MS = 10000
+
+# shared by the upload button and the acknowledgement callback, sends one slice of the selected file
+SEND_CHUNK_JS = """
+    function send_chunk(index) {
+        var state = window._autovis_upload;
+
+        if (state === undefined || index >= state.total) {
+            return;
+        }
+
+        clearTimeout(state.timer);
+        state.index = index;
+
+        var start = index * chunk_size;
+        var reader = new FileReader();
+
+        reader.onload = function(event) {
+            if (window._autovis_upload !== state || state.index != index) {
+                return;
+            }
+            chunk_source.data = {'chunk': [new Uint8Array(event.target.result)], 'index': [index],
+                                 'total': [state.total], 'file_name': [state.file.name],
+                                 'upload_id': [state.id]};
+            // send the chunk again if the server does not acknowledge it
+            state.timer = setTimeout(function() { send_chunk(index); }, retry_ms);
+        };
+
+        reader.onerror = function(evt) {
+            if(evt.target.error.name == "NotReadableError") {
+                alert("Can't read file!");
+            }
+        };
+
+        reader.readAsArrayBuffer(state.file.slice(start, start + chunk_size));
+    }
+"""
+
+
+class ChunkedUpload:
+    """
+    Streams a file from the browser in fixed size binary chunks. Each chunk is acknowledged by the server with the
+    index of the next chunk it expects, so only one chunk is in flight at a time and lost or repeated chunks are sent
+    again from the right place. Chunks are reassembled into a spooled temp file.
+    """
+
+    def __init__(self, on_complete, chunk_size=CHUNK_SIZE):
+        """
+        :param on_complete: called with the binary buffer, the file name and a hash of the contents once the whole
+                            file is in
+        :param chunk_size: bytes per chunk
+        """
+
+        self.on_complete = on_complete
+        self.chunk_size = chunk_size
+
+        self.chunk_source = ColumnDataSource({'chunk': [], 'index': [], 'total': [], 'file_name': [],
+                                              'upload_id': []})
+        self.ack_source = ColumnDataSource({'upload_id': [], 'next_index': [], 'ack': []})
+
+        self.upload_id = None
+        self.buffer = None
+        self.digest = None
+        self.next_index = 0
+        self.total = 0
+        self.acks = 0
+
+        args = dict(chunk_source=self.chunk_source, ack_source=self.ack_source, chunk_size=self.chunk_size,
+                    retry_ms=RETRY_MS)
+
+        self.cb = CustomJS(args=args, code=SEND_CHUNK_JS + """
+            var input = document.createElement('input');
+            input.setAttribute('type', 'file');
+            input.onchange = function(){
+                var file = input.files[0];
+                var previous = window._autovis_upload;
+
+                if (previous !== undefined) {
+                    clearTimeout(previous.timer);
+                }
+
+                window._autovis_upload = {'file': file, 'id': Date.now() + '-' + Math.random(), 'index': 0,
+                                          'total': Math.max(1, Math.ceil(file.size / chunk_size)), 'timer': null};
+                send_chunk(0);
+            }
+            input.click();
+            """)
+
+        self.ack_source.js_on_change('data', CustomJS(args=args, code=SEND_CHUNK_JS + """
+            var state = window._autovis_upload;
+
+            if (state === undefined || ack_source.data['upload_id'][0] != state.id) {
+                return;
+            }
+
+            clearTimeout(state.timer);
+            send_chunk(ack_source.data['next_index'][0]);
+            """))
+
+        self.chunk_source.on_change('data', self.receive)
+
+    def receive(self, attr, old, new):
+        """
+        Writes an incoming chunk to the buffer if it is the one expected and acknowledges it
+
+        :param attr: attribute changes
+        :param old: old value
+        :param new: new value
+        :return: None
+        """
+
+        data = self.chunk_source.data
+
+        if not len(data['index']):
+
+            return
+
+        upload_id = data['upload_id'][0]
+        index = int(data['index'][0])
+
+        if upload_id != self.upload_id:
+
+            # a new file, anything still held for the last one is dropped
+            if index != 0:
+
+                return
+
+            self.start(upload_id, int(data['total'][0]))
+
+        if index == self.next_index:
+
+            chunk = np.asarray(data['chunk'][0], dtype=np.uint8).tobytes()
+
+            self.buffer.write(chunk)
+            self.digest.update(chunk)
+            self.next_index += 1
+
+        file_name = data['file_name'][0]
+
+        # drop the chunk so it is not kept around in the document
+        self.chunk_source.data = {'chunk': [], 'index': [], 'total': [], 'file_name': [], 'upload_id': []}
+
+        self.acknowledge()
+
+        if self.next_index == self.total:
+
+            buffer = self.buffer
+            buffer.seek(0)
+
+            self.buffer = None
+            self.upload_id = None
+
+            self.on_complete(buffer, file_name, self.digest.hexdigest())
+
+    def start(self, upload_id, total):
+
+        if self.buffer is not None:
+
+            self.buffer.close()
+
+        self.upload_id = upload_id
+        self.total = total
+        self.next_index = 0
+        self.buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        self.digest = hashlib.sha256()
+
+    def acknowledge(self):
+
+        # the counter makes every acknowledgement a change, even when the same chunk is asked for again
+        self.acks += 1
+        self.ack_source.data = {'upload_id': [self.upload_id], 'next_index': [self.next_index], 'ack': [self.acks]}